@@ -0,0 +1,69 @@
+"""Times NNConv2d on the CPU in the NCHW and channels-last layouts.
+
+    python benchmarks/nn_conv2d_memory_format.py --batch-size 32 --size 56
+"""
+import argparse
+
+import torch as T
+from nn_methods.nn.nn_conv2d import NNConv2d
+from torch.utils import benchmark
+
+
+def build(args, memory_format):
+    T.manual_seed(0)
+    shape = (args.channels, args.channels, 3, 3)
+    return NNConv2d(args.channels,
+                    args.channels,
+                    3,
+                    w_pos=T.rand(shape),
+                    w_neg=T.rand(shape),
+                    bias=T.zeros(args.channels),
+                    alpha=T.tensor(6.),
+                    activation_shift=T.zeros(args.channels),
+                    padding=1,
+                    memory_format=memory_format)
+
+
+def forward_backward(layer, x):
+    layer(x).sum().backward()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--channels', type=int, default=64)
+    parser.add_argument('--size', type=int, default=56)
+    parser.add_argument('--threads', type=int, default=T.get_num_threads())
+    parser.add_argument('--min-run-time', type=float, default=2.)
+    args = parser.parse_args()
+
+    x = T.rand(args.batch_size, args.channels, args.size, args.size) * 6
+    results = []
+    for name, memory_format in (('nchw', T.contiguous_format),
+                                ('channels_last', T.channels_last)):
+        layer = build(args, memory_format)
+        # The input is converted once here, as the previous layer would
+        # produce it, and not inside the timed region
+        input = x.contiguous(memory_format=memory_format).detach()
+        for label, stmt, grad in (('forward', 'layer(x)', False),
+                                  ('forward+backward',
+                                   'forward_backward(layer, x)', True)):
+            timer = benchmark.Timer(stmt=stmt,
+                                    globals=dict(
+                                        layer=layer.train(grad),
+                                        x=input.requires_grad_(grad),
+                                        forward_backward=forward_backward),
+                                    num_threads=args.threads,
+                                    label='NNConv2d {}x{}x{}x{}'.format(
+                                        args.batch_size, args.channels,
+                                        args.size, args.size),
+                                    sub_label=label,
+                                    description=name)
+            results.append(timer.blocked_autorange(
+                min_run_time=args.min_run_time))
+
+    benchmark.Compare(results).print()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,37 +1,49 @@
 import torch as T
+import torch.nn.functional as F
+
+
+def bounded_relu(x, bound, inplace=False):
+    """Returns ``min(max(x, 0), bound)`` in a single pass over ``x``.
+
+    In place, only the output is kept for backward, as for ``nn.ReLU6``.
+    """
+    return F.hardtanh(x, 0., bound, inplace)
 
 
 class ReLUN(T.nn.Module):
-    def __init__(self, bound=6):
+    def __init__(self, bound=6, inplace=False):
         super().__init__()
         self.bound = bound
+        self.inplace = inplace
 
     def forward(self, x):
-        return T.clamp_max(T.relu(x), self.bound)
+        return bounded_relu(x, self.bound, self.inplace)
 
     def __repr__(self):
         return "ReLU({})".format(self.bound)
 
 
 class ReLU6(T.nn.Module):
-    def __init__(self):
+    def __init__(self, inplace=False):
         super().__init__()
         self.bound = 6
+        self.inplace = inplace
 
     def forward(self, x):
-        return T.clamp_max(T.relu(x), self.bound)
+        return bounded_relu(x, self.bound, self.inplace)
 
     def __repr__(self):
         return "ReLU6"
 
 
 class ReLU2(T.nn.Module):
-    def __init__(self):
+    def __init__(self, inplace=False):
         super().__init__()
         self.bound = 2
+        self.inplace = inplace
 
     def forward(self, x):
-        return T.clamp_max(T.relu(x), self.bound)
+        return bounded_relu(x, self.bound, self.inplace)
 
     def __repr__(self):
-        return "ReLU6"
+        return "ReLU2"
@@ -0,0 +1,37 @@
+import torch as T
+
+
+class FoldCache(object):
+    """Keeps tensors computed from a layer's parameters until they change.
+
+    The cached value is recomputed when one of the source tensors has been
+    written in place, e.g. by an optimizer step or ``load_state_dict``, which
+    bumps its version counter, or has been replaced, e.g. by ``.to()``,
+    which changes its storage.
+
+    Writes through ``.data`` and writes from other processes to shared
+    memory, as in ``hogwild``, bump no version counter the cache can see.
+    After them :meth:`invalidate` must be called, which the NN layers also
+    do whenever they switch between training and eval mode.
+    """
+    def __init__(self):
+        self.key = None
+        self.value = None
+
+    def __call__(self, tensors, fn):
+        """Returns ``fn()``, computed again only if ``tensors`` changed."""
+        key = tuple((t.data_ptr(), t._version) for t in tensors)
+        if key != self.key:
+            # Plain tensors, so that they can be used outside inference mode
+            with T.inference_mode(False), T.no_grad():
+                self.value = fn()
+            self.key = key
+        return self.value
+
+    def invalidate(self):
+        """Drops the cached value, so that the next call recomputes it."""
+        self.key = None
+        self.value = None
+
+    def __repr__(self):
+        return "FoldCache()"
@@ -0,0 +1,110 @@
+import torch as T
+import torch.nn.functional as F
+from torch.autograd.function import once_differentiable
+from torch.utils.checkpoint import checkpoint
+
+# The NN layers compute ``l_pos(x) + l_neg(alpha - x) + bias - shift``. The
+# functions below run it as one product with ``w_pos - w_neg`` plus a
+# constant, and save only ``x`` for backward: ``alpha - x`` is rebuilt there,
+# where it is needed for the gradient of ``w_neg``.
+
+
+class NNLinearFunction(T.autograd.Function):
+    @staticmethod
+    def forward(ctx, x, w_pos, w_neg, bias, alpha, activation_shift):
+        alpha = alpha.expand(w_neg.size(1)).to(w_neg.dtype)
+        ctx.save_for_backward(x, w_pos, w_neg, alpha)
+        return F.linear(x, w_pos - w_neg,
+                        bias + T.mv(w_neg, alpha) - activation_shift)
+
+    @staticmethod
+    @once_differentiable
+    def backward(ctx, grad):
+        x, w_pos, w_neg, alpha = ctx.saved_tensors
+        grad_x = grad_w_pos = grad_w_neg = grad_bias = None
+
+        if ctx.needs_input_grad[0]:
+            grad_x = grad.matmul(w_pos - w_neg)
+        if ctx.needs_input_grad[1] or ctx.needs_input_grad[2]:
+            x = x.reshape(-1, x.size(-1))
+            flat_grad = grad.reshape(-1, grad.size(-1))
+            # Both weight gradients in one GEMM over [x, alpha - x]
+            grad_w = flat_grad.t().matmul(T.cat([x, alpha - x], dim=1))
+            grad_w_pos, grad_w_neg = grad_w.split(x.size(1), dim=1)
+        if ctx.needs_input_grad[3]:
+            grad_bias = grad.reshape(-1, grad.size(-1)).sum(0)
+
+        return grad_x, grad_w_pos, grad_w_neg, grad_bias, None, None
+
+
+class NNConv2dFunction(T.autograd.Function):
+    @staticmethod
+    def forward(ctx, x, w_pos, w_neg, bias, alpha, activation_shift, stride,
+                padding, dilation, groups):
+        conv = dict(stride=stride,
+                    padding=padding,
+                    dilation=dilation,
+                    groups=groups)
+        # l_neg(alpha) with zero padding, which is smaller at the borders
+        # zeros_like keeps the layout of x, e.g. channels last
+        zeros = T.zeros_like(x[:1])
+        offset = F.conv2d(alpha - zeros, w_neg, **conv)
+        offset += (bias - activation_shift).view(-1, 1, 1)
+
+        ctx.save_for_backward(x, w_pos, w_neg, alpha)
+        ctx.conv = conv
+        return F.conv2d(x, w_pos - w_neg, **conv).add_(offset)
+
+    @staticmethod
+    @once_differentiable
+    def backward(ctx, grad):
+        x, w_pos, w_neg, alpha = ctx.saved_tensors
+        conv = ctx.conv
+        grad_x = grad_w_pos = grad_w_neg = grad_bias = None
+
+        if ctx.needs_input_grad[0]:
+            grad_x = T.nn.grad.conv2d_input(x.shape, w_pos - w_neg, grad,
+                                            **conv)
+        if ctx.needs_input_grad[1]:
+            grad_w_pos = T.nn.grad.conv2d_weight(x, w_pos.shape, grad, **conv)
+        if ctx.needs_input_grad[2]:
+            grad_w_neg = T.nn.grad.conv2d_weight(alpha - x, w_neg.shape, grad,
+                                                 **conv)
+        if ctx.needs_input_grad[3]:
+            grad_bias = grad.sum((0, 2, 3))
+
+        return (grad_x, grad_w_pos, grad_w_neg, grad_bias) + (None, ) * 6
+
+
+def nn_linear(x, w_pos, w_neg, bias, alpha, activation_shift):
+    """The forward of :class:`NNLinear` that saves only ``x``."""
+    return NNLinearFunction.apply(x, w_pos, w_neg, bias, alpha,
+                                  activation_shift)
+
+
+def nn_conv2d(x, w_pos, w_neg, bias, alpha, activation_shift, stride=1,
+              padding=0, dilation=1, groups=1):
+    """The forward of :class:`NNConv2d` with zero padding that saves only
+    ``x``."""
+    return NNConv2dFunction.apply(x, w_pos, w_neg, bias, alpha,
+                                  activation_shift, stride, padding, dilation,
+                                  groups)
+
+
+class Checkpointed(T.nn.Module):
+    """Runs ``module`` in training without keeping its activations.
+
+    Only the input of ``module`` is saved and its forward runs again during
+    backward, which trades compute for activation memory. Wrapping a stack
+    of NN layers and their activations, e.g. ``Checkpointed(nn.Sequential(
+    layer1, ReLU6(), layer2, ReLU6()))``, keeps a single tensor alive for
+    the whole stack.
+    """
+    def __init__(self, module):
+        super().__init__()
+        self.module = module
+
+    def forward(self, *inputs):
+        if self.training and T.is_grad_enabled():
+            return checkpoint(self.module, *inputs, use_reentrant=False)
+        return self.module(*inputs)
@@ -3,6 +3,12 @@ from torch.nn.common_types import _size_1_t, _size_2_t, _size_3_t
 from torch.nn.modules.utils import (_pair, _reverse_repeat_tuple, _single,
                                     _triple)
 
+from .activations.relus import bounded_relu
+from .folding import FoldCache
+from .functional import nn_conv2d
+from .utils import (PackedParameter, as_factory, factory_kwargs_like, pack,
+                    unpack)
+
 
 class NNConv2d(T.nn.Module):
     def __init__(self,
@@ -18,10 +24,20 @@ class NNConv2d(T.nn.Module):
                  padding: _size_2_t = 0,
                  dilation: _size_2_t = 1,
                  groups: int = 1,
-                 padding_mode: str = 'zeros'):
+                 padding_mode: str = 'zeros',
+                 packed: bool = False,
+                 memory_format: T.memory_format = T.contiguous_format,
+                 activation_bound: float = None,
+                 device=None,
+                 dtype=None):
         super().__init__()
-        super().cuda()
+        factory_kwargs = factory_kwargs_like(w_pos, device, dtype)
+        # The layout of the weights and of every activation of the layer,
+        # e.g. T.channels_last, which the CPU convolutions run faster on
+        self.memory_format = memory_format
 
+        # The layers are built on the meta device, so their default
+        # initialization neither allocates nor runs before being replaced
         self.l_pos = T.nn.Conv2d(
             in_channels,
             out_channels,
@@ -32,6 +48,7 @@ class NNConv2d(T.nn.Module):
             groups=groups,
             bias=False,
             padding_mode=padding_mode,
+            device='meta',
         )
 
         self.l_neg = T.nn.Conv2d(
@@ -44,29 +61,132 @@ class NNConv2d(T.nn.Module):
             groups=groups,
             bias=False,
             padding_mode=padding_mode,
+            device='meta',
         )
 
-        self.bias = T.nn.Parameter(bias.cuda())
+        self.bias = T.nn.Parameter(as_factory(bias, **factory_kwargs))
+
+        self.packed = packed
+        if packed:
+            # One signed tensor holds both weights, so the parameters and
+            # their optimizer state take half the memory. Only the rules
+            # listed in unpack update it as the two weights
+            self.weight = PackedParameter(
+                as_factory(pack(w_pos, w_neg),
+                           **factory_kwargs).contiguous(
+                               memory_format=memory_format))
+            del self.l_pos.weight
+            del self.l_neg.weight
+        else:
+            self.l_pos.weight = T.nn.Parameter(
+                as_factory(w_pos, **factory_kwargs).contiguous(
+                    memory_format=memory_format))
+            self.l_neg.weight = T.nn.Parameter(
+                as_factory(w_neg, **factory_kwargs).contiguous(
+                    memory_format=memory_format))
+
+        self.register_buffer('alpha', as_factory(alpha, **factory_kwargs))
 
-        self.l_pos.weight = T.nn.Parameter(w_pos.cuda())
-        self.l_neg.weight = T.nn.Parameter(w_neg.cuda())
+        self.register_buffer('activation_shift',
+                             as_factory(activation_shift, **factory_kwargs))
 
-        self.register_buffer('alpha', alpha)
+        # The bound of a ReLUN that follows the layer, applied in place to
+        # its output instead of as a separate module
+        self.activation_bound = activation_bound
 
-        self.register_buffer('activation_shift', activation_shift)
+        self.folded = False
+        self.fold_cache = FoldCache()
 
     def forward(self, x):
+        # A no-op for inputs already in the layout of the layer, after which
+        # every elementwise op and convolution keeps it
+        x = x.contiguous(memory_format=self.memory_format)
+        if self.folded and not self.training:
+            weight, offset = self.folded_params(x)
+            return self.epilogue(
+                self.l_pos._conv_forward(x, weight, None).add_(offset))
+
+        w_pos, w_neg = self.weights()
+        conv = self.l_pos
+        if conv.padding_mode == 'zeros' and not isinstance(conv.padding, str):
+            # One convolution with w_pos - w_neg that saves only x
+            return self.epilogue(
+                nn_conv2d(x, w_pos, w_neg, self.bias, self.alpha,
+                          self.activation_shift, conv.stride, conv.padding,
+                          conv.dilation, conv.groups))
+
         x_t = self.alpha - x
 
-        x_pos = self.l_pos(x)
-        x_neg = self.l_neg(x_t)
+        x_pos = self.l_pos._conv_forward(x, w_pos, None)
+        x_neg = self.l_neg._conv_forward(x_t, w_neg, None)
+
+        # The bias and the shift are combined per channel, so that they take
+        # one pass over the output
+        x = (x_pos + x_neg).add_(
+            (self.bias - self.activation_shift).view(-1, 1, 1))
 
-        x = x_pos + x_neg + self.bias.view(-1, 1, 1).repeat(
-            1, x_pos.size(-2), x_pos.size(-1)).expand_as(x_pos)
+        return self.epilogue(x)
 
-        x = x - self.activation_shift
+    def epilogue(self, x):
+        """Applies the bounded activation, if any, in place to the output."""
+        if self.activation_bound is None:
+            return x
+        return bounded_relu(x, self.activation_bound, inplace=True)
 
-        return x
+    def weights(self):
+        """Returns ``w_pos`` and ``w_neg``, unpacked if ``packed``."""
+        if self.packed:
+            return unpack(self.weight)
+        return self.l_pos.weight, self.l_neg.weight
+
+    def weight_parameters(self):
+        """Returns the parameters that store the weights."""
+        if self.packed:
+            return [self.weight]
+        return [self.l_pos.weight, self.l_neg.weight]
 
     def get_weight(self):
-        return self.l_pos.weight + self.l_neg.weight
+        w_pos, w_neg = self.weights()
+        return w_pos + w_neg
+
+    def fold(self, mode=True):
+        """Runs inference as one convolution with folded parameters.
+
+        ``l_neg(alpha - x)`` equals ``l_neg(alpha)`` minus ``l_neg(x)``, so in
+        eval mode the layer convolves ``x`` once with ``w_pos - w_neg`` and
+        adds a per-channel offset map. The map holds the bias, the shift and
+        ``l_neg(alpha)``, which with zero padding is only smaller at the
+        borders. The folded weight and the map of every input size are
+        cached until the parameters change, see :class:`FoldCache`. The
+        folded path does not propagate gradients to the parameters.
+        """
+        self.folded = mode
+        self.fold_cache.invalidate()
+        return self
+
+    def train(self, mode=True):
+        # The parameters may have been written during training in ways the
+        # cache does not see, e.g. through .data or by other processes
+        self.fold_cache.invalidate()
+        return super().train(mode)
+
+    def folded_params(self, x):
+        """Returns the folded weight and the offset map for ``x``."""
+        def fold():
+            # The offset maps are kept per input size next to the weight,
+            # so that they are dropped with it
+            w_pos, w_neg = self.weights()
+            return w_pos - w_neg, {}
+
+        weight, offsets = self.fold_cache(
+            self.weight_parameters() +
+            [self.bias, self.alpha, self.activation_shift], fold)
+        size = tuple(x.shape[-2:])
+        if size not in offsets:
+            with T.inference_mode(False), T.no_grad():
+                _, w_neg = self.weights()
+                zeros = T.zeros_like(x[:1])
+                offsets[size] = (
+                    self.l_neg._conv_forward(self.alpha - zeros, w_neg, None) +
+                    self.bias.view(-1, 1, 1) - self.activation_shift)
+        return weight, offsets[size]
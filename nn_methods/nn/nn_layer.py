@@ -1,4 +1,11 @@
 import torch as T
+import torch.nn.functional as F
+
+from .activations.relus import bounded_relu
+from .folding import FoldCache
+from .functional import nn_linear
+from .utils import (PackedParameter, as_factory, factory_kwargs_like, pack,
+                    unpack)
 
 
 class NNLinear(T.nn.Module):
@@ -11,30 +18,110 @@ class NNLinear(T.nn.Module):
         bias,
         alpha,
         activation_shift,
+        packed=False,
+        activation_bound=None,
+        device=None,
+        dtype=None,
     ):
         super().__init__()
-        super().cuda()
+        factory_kwargs = factory_kwargs_like(w_pos, device, dtype)
+
+        # The layers are built on the meta device, so their default
+        # initialization neither allocates nor runs before being replaced
+        self.l_pos = T.nn.Linear(fan_in, fan_out, bias=False, device='meta')
+        self.l_neg = T.nn.Linear(fan_in, fan_out, bias=False, device='meta')
 
-        self.l_pos = T.nn.Linear(fan_in, fan_out, bias=False)
-        self.l_neg = T.nn.Linear(fan_in, fan_out, bias=False)
+        self.packed = packed
+        if packed:
+            # One signed tensor holds both weights, so the parameters and
+            # their optimizer state take half the memory. Only the rules
+            # listed in unpack update it as the two weights
+            self.weight = PackedParameter(
+                as_factory(pack(w_pos, w_neg), **factory_kwargs))
+            del self.l_pos.weight
+            del self.l_neg.weight
+        else:
+            self.l_pos.weight = T.nn.Parameter(
+                as_factory(w_pos, **factory_kwargs))
+            self.l_neg.weight = T.nn.Parameter(
+                as_factory(w_neg, **factory_kwargs))
 
-        self.l_pos.weight = T.nn.Parameter(w_pos.cuda())
-        self.l_neg.weight = T.nn.Parameter(w_neg.cuda())
+        self.bias = T.nn.Parameter(as_factory(bias, **factory_kwargs))
 
-        self.bias = T.nn.Parameter(bias.cuda())
+        self.register_buffer('alpha', as_factory(alpha, **factory_kwargs))
 
-        # self.weight = T.nn.Parameter(self.l_pos.weight + self.l_neg.weight,
-        #                              True)
+        self.register_buffer('activation_shift',
+                             as_factory(activation_shift, **factory_kwargs))
 
-        self.register_buffer('alpha', alpha)
+        # The bound of a ReLUN that follows the layer, applied in place to
+        # its output instead of as a separate module
+        self.activation_bound = activation_bound
 
-        self.register_buffer('activation_shift', activation_shift)
+        self.folded = False
+        self.fold_cache = FoldCache()
 
     def forward(self, x):
-        x_t = self.alpha - x
-        x = self.l_pos(x) + self.l_neg(x_t) + self.bias
-        x = x - self.activation_shift
-        return x
+        if self.folded and not self.training:
+            weight, bias = self.folded_params()
+            return self.epilogue(F.linear(x, weight, bias))
+
+        # One GEMM with w_pos - w_neg, the bias and the shift fused into it.
+        # Only x is saved for backward, where one GEMM over [x, alpha - x]
+        # gives the gradients of both weights
+        w_pos, w_neg = self.weights()
+        return self.epilogue(
+            nn_linear(x, w_pos, w_neg, self.bias, self.alpha,
+                      self.activation_shift))
+
+    def epilogue(self, x):
+        """Applies the bounded activation, if any, in place to the output."""
+        if self.activation_bound is None:
+            return x
+        return bounded_relu(x, self.activation_bound, inplace=True)
+
+    def weights(self):
+        """Returns ``w_pos`` and ``w_neg``, unpacked if ``packed``."""
+        if self.packed:
+            return unpack(self.weight)
+        return self.l_pos.weight, self.l_neg.weight
+
+    def weight_parameters(self):
+        """Returns the parameters that store the weights."""
+        if self.packed:
+            return [self.weight]
+        return [self.l_pos.weight, self.l_neg.weight]
 
     def get_weight(self):
-        return self.l_pos.weight + self.l_neg.weight
+        w_pos, w_neg = self.weights()
+        return w_pos + w_neg
+
+    def fold(self, mode=True):
+        """Runs inference as one GEMM with folded parameters.
+
+        ``l_pos(x) + l_neg(alpha - x)`` equals ``x @ (w_pos - w_neg)^T`` plus
+        ``w_neg @ alpha``, so in eval mode the layer is a single linear layer
+        whose weight and bias are cached until the parameters change, see
+        :class:`FoldCache`. The folded path does not propagate gradients to
+        the parameters.
+        """
+        self.folded = mode
+        self.fold_cache.invalidate()
+        return self
+
+    def train(self, mode=True):
+        # The parameters may have been written during training in ways the
+        # cache does not see, e.g. through .data or by other processes
+        self.fold_cache.invalidate()
+        return super().train(mode)
+
+    def folded_params(self):
+        """Returns the cached weight and bias of the folded layer."""
+        def fold():
+            w_pos, w_neg = self.weights()
+            alpha = self.alpha.expand(w_neg.size(1)).to(w_neg.dtype)
+            bias = self.bias + T.mv(w_neg, alpha) - self.activation_shift
+            return w_pos - w_neg, bias
+
+        return self.fold_cache(
+            self.weight_parameters() +
+            [self.bias, self.alpha, self.activation_shift], fold)
@@ -0,0 +1,124 @@
+import torch as T
+import torch.ao.nn.quantized as nnq
+import torch.ao.nn.quantized.functional as qF
+
+# Levels of the unsigned 8-bit activations
+LEVELS = 255
+
+
+def quantize_weight(weight, backend):
+    """Quantizes the non-negative ``weight`` per output channel to qint8.
+
+    Since no weight is negative, fbgemm maps ``[0, max]`` of every channel
+    onto all 256 codes with a zero point of -128, which is one more bit of
+    resolution than a symmetric scheme. onednn only takes symmetric weights
+    and uses the 128 non-negative codes.
+    """
+    absmax = weight.detach().flatten(1).amax(dim=1).float()
+    absmax.clamp_min_(T.finfo(T.float32).tiny)
+    if backend == 'fbgemm':
+        scales = absmax / 255
+        zero_points = T.full_like(scales, -128, dtype=T.long)
+    else:
+        scales = absmax / 127
+        zero_points = T.zeros_like(scales, dtype=T.long)
+    return T.quantize_per_channel(weight.detach().float(), scales.double(),
+                                  zero_points, 0, T.qint8)
+
+
+def input_scale(layer):
+    """The scale that maps the inputs of ``layer``, in ``[0, alpha]``, to
+    the full uint8 range."""
+    if layer.alpha.numel() != 1:
+        raise ValueError("Quantization requires a scalar alpha")
+    return float(layer.alpha) / LEVELS
+
+
+def quantize_input(x, scale):
+    """Quantizes ``x`` to quint8 with a zero point of 0 and ``scale``."""
+    if x.is_quantized:
+        if x.q_scale() == scale and x.q_zero_point() == 0:
+            return x
+        x = x.dequantize()
+    return T.quantize_per_tensor(x.float(), scale, 0, T.quint8)
+
+
+def complement(x):
+    """Returns ``alpha - x`` for ``x`` quantized by :func:`quantize_input`.
+
+    ``alpha`` is the largest code, so the complement is exact in the integer
+    domain.
+    """
+    return T._make_per_tensor_quantized_tensor(LEVELS - x.int_repr(),
+                                               x.q_scale(), 0)
+
+
+def bound_output(x, bound):
+    """Applies the bounded activation fused into a layer, if any, to its
+    quantized output ``x``."""
+    if bound is None:
+        return x
+    return qF.hardtanh(x, 0., bound)
+
+
+class QuantizedNNLinear(T.nn.Module):
+    """An :class:`NNLinear` with uint8 activations and 8-bit weights.
+
+    Inputs in ``[0, alpha]`` are quantized with a scale of ``alpha / 255``.
+    Both branches run as one quantized GEMM over ``[x, alpha - x]`` with the
+    stacked non-negative weights. The bounded activation of the layer, if
+    any, clamps the quantized output, which is returned in float.
+    """
+    def __init__(self, layer, output_qparams, backend='fbgemm'):
+        super().__init__()
+        self.scale = input_scale(layer)
+        weight = T.cat(layer.weights(), dim=1)
+        self.linear = nnq.Linear(weight.size(1),
+                                 weight.size(0),
+                                 dtype=T.qint8)
+        bias = (layer.bias - layer.activation_shift).detach().float()
+        self.linear.set_weight_bias(quantize_weight(weight, backend), bias)
+        self.linear.scale, self.linear.zero_point = output_qparams
+        self.activation_bound = layer.activation_bound
+
+    def forward(self, x):
+        x = quantize_input(x, self.scale)
+        x = T.cat([x, complement(x)], dim=-1)
+        return bound_output(self.linear(x), self.activation_bound).dequantize()
+
+
+class QuantizedNNConv2d(T.nn.Module):
+    """An :class:`NNConv2d` with uint8 activations and 8-bit weights.
+
+    As :class:`QuantizedNNLinear`, with ``x`` and ``alpha - x`` stacked on
+    the channels of every group.
+    """
+    def __init__(self, layer, output_qparams, backend='fbgemm'):
+        super().__init__()
+        conv = layer.l_pos
+        if conv.padding_mode != 'zeros':
+            raise ValueError(
+                "Quantization requires zero padding, got {}".format(
+                    conv.padding_mode))
+        self.scale = input_scale(layer)
+        self.groups = conv.groups
+        weight = T.cat(layer.weights(), dim=1)
+        self.conv = nnq.Conv2d(2 * conv.in_channels,
+                               conv.out_channels,
+                               conv.kernel_size,
+                               stride=conv.stride,
+                               padding=conv.padding,
+                               dilation=conv.dilation,
+                               groups=conv.groups)
+        bias = (layer.bias - layer.activation_shift).detach().float()
+        self.conv.set_weight_bias(quantize_weight(weight, backend), bias)
+        self.conv.scale, self.conv.zero_point = output_qparams
+        self.activation_bound = layer.activation_bound
+
+    def forward(self, x):
+        x = quantize_input(x, self.scale)
+        n, c, h, w = x.shape
+        # Each group sees its own channels of x followed by those of alpha - x
+        x = x.reshape(n, self.groups, c // self.groups, h, w)
+        x = T.cat([x, complement(x)], dim=2).reshape(n, 2 * c, h, w)
+        return bound_output(self.conv(x), self.activation_bound).dequantize()
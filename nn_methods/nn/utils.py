@@ -0,0 +1,66 @@
+import torch as T
+
+
+def as_factory(t, device=None, dtype=None):
+    """Detaches ``t`` and moves it to ``device`` and ``dtype`` if given.
+
+    Floating point dtypes only apply to floating point tensors. With
+    ``device='meta'`` only the shape is kept, for deferred materialization
+    with ``to_empty`` and ``load_state_dict``.
+    """
+    t = T.as_tensor(t).detach()
+    if dtype is not None and not t.is_floating_point():
+        dtype = None
+    return t.to(device=device, dtype=dtype)
+
+
+def factory_kwargs_like(weight, device=None, dtype=None):
+    """The ``device`` and ``dtype`` of the tensors of a layer.
+
+    They default to those of ``weight``, so that a Python scalar or a CPU
+    tensor given for ``alpha``, ``activation_shift`` or ``bias`` is built
+    next to the weights, e.g. on the meta device or a GPU.
+    """
+    weight = T.as_tensor(weight)
+    if device is None:
+        device = weight.device
+    if dtype is None and weight.is_floating_point():
+        dtype = weight.dtype
+    return dict(device=device, dtype=dtype)
+
+
+def pack(w_pos, w_neg):
+    """Packs the weight pair of an NN layer into one signed tensor.
+
+    ``w_pos`` is kept where the result is positive and ``w_neg`` where it is
+    negative, which requires non-negative weights with disjoint supports,
+    as produced by ``nn_transformation``.
+    """
+    if not w_pos.is_meta and ((w_pos < 0).any() or (w_neg < 0).any() or
+                              ((w_pos != 0) & (w_neg != 0)).any()):
+        raise ValueError("Packing requires non-negative weights with "
+                         "disjoint supports")
+    return w_pos - w_neg
+
+
+def unpack(weight):
+    """Returns the ``w_pos`` and ``w_neg`` of a weight made by :func:`pack`.
+
+    Their gradients flow back into ``weight`` with the sign of each entry.
+    A rule applied to ``weight`` updates both as if they were separate
+    parameters only if it scales every entry without moving it across zero:
+    ``M_ABS``, ``M_SPOW`` and ``H_ABS`` with ``g = 1``. Under the others an
+    entry of the pair can not grow from zero, ``N_Clip`` zeroes ``w_neg``
+    and ``N_ABS`` moves it into ``w_pos``, so the optimizers warn when they
+    get a :class:`PackedParameter` with such a rule.
+    """
+    return T.relu(weight), T.relu(-weight)
+
+
+class PackedParameter(T.nn.Parameter):
+    """A parameter holding a weight made by :func:`pack`.
+
+    The optimizers check ``packed`` to warn about rules that do not update it
+    as the unpacked pair, see :func:`unpack`.
+    """
+    packed = True
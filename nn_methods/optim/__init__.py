@@ -1,3 +1,6 @@
+from .backward import BackwardOptimizer
+from .compiled import CompiledRule
+from .hogwild import hogwild
 from .hybrid.h_adagrad import HAdagrad
 from .hybrid.h_adam import HAdam
 from .hybrid.h_rmsprop import HRMSprop
@@ -6,4 +9,5 @@ from .nn_adagrad import MAdagrad
 from .nn_adam import NNAdam
 from .nn_rmsprop import NNRMSprop
 from .nn_sgd_momentum import MSGD
+from .sharded import ShardedOptimizer
 from .updates import *
@@ -0,0 +1,105 @@
+import torch as T
+
+from .flat import can_step_flat, gather_grads
+
+
+def check_boundary(counts):
+    """Raises if one of the windows counted in ``counts`` is not over."""
+    if any(count != 0 for count in counts.values()):
+        raise RuntimeError(
+            "state_dict called inside an accumulation window, whose summed "
+            "gradients it does not hold; call it after the step that ends "
+            "the window")
+
+
+class Accumulator(object):
+    """Sums the gradients of a group over ``accumulation_steps`` micro-steps.
+
+    ``step`` is called after every micro-batch as usual, with the gradients
+    zeroed in between. On the micro-steps inside a window the gradients are
+    only added to buffers that are allocated once and reused by every window,
+    and the update is skipped. On the last one the gradients are replaced in
+    place by their mean over the window and the update runs on them.
+
+    Flat groups accumulate into one buffer shaped like their flat storage,
+    so a micro-step costs one copy and one addition for the whole group.
+
+    The counts and the sums of a window are not part of the optimizer state,
+    so checkpoints are taken on window boundaries: :meth:`check_boundary`
+    fails inside a window and a loaded state starts a new one.
+    """
+    def __init__(self):
+        self.counts = {}
+        self.buffers = {}
+        self.flat_buffers = {}
+
+    @T.no_grad()
+    def __call__(self, i, group, flat=None):
+        """Accumulates the gradients of the ``i``-th group.
+
+        Returns whether the group should be updated on this micro-step.
+        """
+        steps = group['accumulation_steps']
+        if steps == 1:
+            return True
+        count = self.counts.get(i, 0) + 1
+        self.counts[i] = count % steps
+
+        params = [p for p in group['params'] if p.grad is not None]
+        if flat is not None and can_step_flat(group['params'], params,
+                                              [0] * len(params)):
+            if i not in self.flat_buffers:
+                self.flat_buffers[i] = T.empty_like(flat['params'])
+            grads = [gather_grads(group['params'], flat['grad'])]
+            buffers = [self.flat_buffers[i]]
+        else:
+            dense = [p for p in params if not p.grad.is_sparse]
+            for p in dense:
+                if p not in self.buffers:
+                    self.buffers[p] = T.zeros_like(
+                        p, memory_format=T.preserve_format)
+            grads = [p.grad for p in dense]
+            buffers = [self.buffers[p] for p in dense]
+            self.accumulate_sparse([p for p in params if p.grad.is_sparse],
+                                   count, steps)
+
+        if count == 1:
+            # Parameters without a gradient on the first micro-step must not
+            # carry the sum of the previous window
+            for p in group['params']:
+                if p.grad is None and p in self.buffers:
+                    self.buffers[p].zero_()
+        if len(grads) == 0:
+            return count == steps
+        if count == 1:
+            for buf, grad in zip(buffers, grads):
+                buf.copy_(grad)
+        elif count < steps:
+            T._foreach_add_(buffers, grads)
+        else:
+            T._foreach_add_(grads, buffers)
+            T._foreach_mul_(grads, 1 / steps)
+        return count == steps
+
+    def accumulate_sparse(self, params, count, steps):
+        # Sparse gradients are summed as sparse tensors, which keeps the
+        # update lazy but allocates the sum
+        for p in params:
+            if count == 1:
+                self.buffers[p] = p.grad.clone()
+            elif count < steps:
+                self.buffers[p] = self.buffers[p] + p.grad
+            else:
+                p.grad = (self.buffers.pop(p) + p.grad).coalesce() / steps
+
+    def check_boundary(self):
+        """Raises if a window has started and not ended yet."""
+        check_boundary(self.counts)
+
+    def clear(self):
+        self.counts = {}
+        self.buffers = {}
+        self.flat_buffers = {}
+
+    def __repr__(self):
+        return "Accumulator()"
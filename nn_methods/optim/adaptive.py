@@ -0,0 +1,242 @@
+import torch as T
+from torch.optim.optimizer import Optimizer
+
+from .accumulation import Accumulator
+from .capturable import HyperTensors, restore_steps_, step_tensor
+from .compiled import rule_kernel
+from .flat import (can_step_flat, flatten_params, flatten_state,
+                   gather_grads, is_flat)
+from .groups import check_packed
+from .hogwild import share_memory_
+from .quantization import (MIN_SIZE, dequantize_state, quantize_state_,
+                           requantize_state_, restore_state_)
+from .updates import StochasticRounding
+from .workspace import Workspace
+
+
+class AdaptiveOptimizer(Optimizer):
+    """Base of the optimizers that keep a step count and state buffers for
+    every parameter: NNAdam, NNRMSprop, MAdagrad and their hybrid variants.
+
+    It validates the options they share and runs the parts of a step that do
+    not depend on the algorithm: flat storage, gradient accumulation,
+    capturable steps and hyperparameters, stochastic rounding and 8-bit
+    state. A subclass names its buffers in ``STATE``, returns those that a
+    group uses from :meth:`state_keys` and applies its update to lists of
+    tensors in :meth:`update`.
+    """
+    # State buffers of the algorithm and whether they can be negative
+    STATE = {}
+    # Hyperparameters passed as 0-d tensors in capturable groups
+    HYPERPARAMETERS = ('lr_in', 'lr_out', 'g')
+    # Options of a group and their values for states saved without them
+    OPTIONS = dict(flat=False,
+                   workspace=False,
+                   compiled=False,
+                   accumulation_steps=1,
+                   foreach=False,
+                   capturable=False,
+                   num_threads=1)
+
+    def __init__(self, params, defaults):
+        if not 0.0 <= defaults['lr_in']:
+            raise ValueError("Invalid inner learning rate: {}".format(
+                defaults['lr_in']))
+        if not 0.0 <= defaults['lr_out']:
+            raise ValueError("Invalid outer learning rate: {}".format(
+                defaults['lr_out']))
+        if 'lr' in defaults and not 0.0 <= defaults['lr']:
+            raise ValueError("Invalid learning rate: {}".format(
+                defaults['lr']))
+        if defaults['g'] < 0.0 or defaults['g'] > 1.0:
+            raise ValueError("Invalid g value: {}".format(defaults['g']))
+        if not 0.0 <= defaults['eps']:
+            raise ValueError("Invalid epsilon value: {}".format(
+                defaults['eps']))
+        if not 0.0 <= defaults['weight_decay']:
+            raise ValueError("Invalid weight_decay value: {}".format(
+                defaults['weight_decay']))
+        if defaults['flat'] and defaults.get('quantize_state', False):
+            raise ValueError("flat and quantize_state cannot be used together")
+        if defaults['capturable'] and rule_kernel(defaults['u_func']) is None:
+            raise ValueError(
+                "capturable needs a rule with a kernel: {}".format(
+                    defaults['u_func']))
+        if defaults['capturable'] and defaults.get('stochastic_rounding',
+                                                   False):
+            raise ValueError(
+                "capturable and stochastic_rounding cannot be used together")
+        if defaults['accumulation_steps'] < 1:
+            raise ValueError("Invalid accumulation_steps value: {}".format(
+                defaults['accumulation_steps']))
+        if defaults['num_threads'] < 1:
+            raise ValueError("Invalid num_threads value: {}".format(
+                defaults['num_threads']))
+        super().__init__(params, defaults)
+        self.flat_groups = {}
+        self.workspace = Workspace()
+        self.accumulator = Accumulator()
+        self.hyper = HyperTensors(self.HYPERPARAMETERS)
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.flat_groups = {}
+        self.workspace = Workspace()
+        self.accumulator = Accumulator()
+        self.hyper = HyperTensors(self.HYPERPARAMETERS)
+        for group in self.param_groups:
+            for key, value in self.OPTIONS.items():
+                group.setdefault(key, value)
+
+    def state_dict(self):
+        self.accumulator.check_boundary()
+        return super().state_dict()
+
+    def load_state_dict(self, state_dict):
+        super().load_state_dict(state_dict)
+        # The loaded state is packed again on the next step and starts a new
+        # accumulation window
+        self.flat_groups = {}
+        self.accumulator.clear()
+        for state in self.state.values():
+            restore_state_(state, self.STATE)
+        restore_steps_(self)
+
+    def state_keys(self, group):
+        """Returns the keys of the state buffers used by ``group``."""
+        raise NotImplementedError
+
+    def initial_state(self, p, group, key):
+        """Returns the initial value of the buffer ``key`` of ``p``."""
+        return T.zeros_like(p, memory_format=T.preserve_format)
+
+    def init_state(self, p, group):
+        state = self.state[p]
+        state['step'] = step_tensor(p) if group['capturable'] else 0
+        for key in self.state_keys(group):
+            state[key] = self.initial_state(p, group, key)
+        if group.get('quantize_state', False) and p.numel() >= MIN_SIZE:
+            quantize_state_(state, self.STATE)
+
+    def flatten_group(self, group):
+        params = group['params']
+        flat = dict(params=flatten_params(params))
+        flat['grad'] = T.empty_like(flat['params'])
+        for p in params:
+            if len(self.state[p]) == 0:
+                self.init_state(p, group)
+        flat.update(flatten_state(self.state, params, self.state_keys(group)))
+        return flat
+
+    def share_memory(self):
+        """Allocates the state of every parameter in shared memory."""
+        share_memory_(self)
+
+    def add_param_group(self, param_group):
+        super().add_param_group(param_group)
+        group = self.param_groups[-1]
+        if group.get('stochastic_rounding', False) and not isinstance(
+                group['u_func'], StochasticRounding):
+            group['u_func'] = StochasticRounding(group['u_func'])
+        check_packed(group)
+
+    def options(self, group):
+        """Returns the options of ``group`` that select how the functional
+        update runs."""
+        return dict(compiled=group['compiled'],
+                    workspace=self.workspace if group['workspace'] else None,
+                    foreach=group['foreach'],
+                    capturable=group['capturable'],
+                    num_threads=group['num_threads'])
+
+    def update(self, group, hyper, params, grads, buffers, state_steps):
+        """Applies the update of the algorithm.
+
+        ``buffers`` maps every key of ``STATE`` to the list of its buffers,
+        aligned with ``params``, and is empty for the keys the group does not
+        use. ``hyper`` holds the hyperparameters, as 0-d tensors in
+        capturable groups.
+        """
+        raise NotImplementedError
+
+    @T.no_grad()
+    def step(self, closure=None):
+        """Performs a single optimization step.
+
+        Arguments:
+            closure (callable, optional): A closure that reevaluates the model
+                and returns the loss.
+        """
+        loss = None
+        if closure is not None:
+            with T.enable_grad():
+                loss = closure()
+
+        for i, group in enumerate(self.param_groups):
+            if group['flat'] and not is_flat(
+                    group['params'],
+                    self.flat_groups.get(i, {}).get('params')):
+                # Also packs again parameters moved out of the flat
+                # storage, e.g. by model.to() or model.half()
+                self.flat_groups[i] = self.flatten_group(group)
+                self.accumulator.flat_buffers.pop(i, None)
+            if not self.accumulator(i, group, self.flat_groups.get(i)):
+                continue
+
+            keys = self.state_keys(group)
+            params_with_grad = []
+            grads = []
+            buffers = {key: [] for key in self.STATE}
+            state_steps = []
+
+            for p in group['params']:
+                if p.grad is None:
+                    continue
+                params_with_grad.append(p)
+                grads.append(p.grad)
+
+                state = self.state[p]
+                # State initialization
+                if len(state) == 0:
+                    self.init_state(p, group)
+
+                for key in keys:
+                    buffers[key].append(state[key])
+
+                if not group['capturable']:
+                    # update the steps for each param group update
+                    state['step'] += 1
+                # record the step after step update
+                state_steps.append(state['step'])
+
+            if group['capturable'] and len(state_steps) > 0:
+                # The steps of the whole group advance in one pass
+                T._foreach_add_(state_steps, 1)
+            hyper = self.hyper(i, group) if group['capturable'] else group
+
+            if group['flat'] and can_step_flat(group['params'],
+                                               params_with_grad, state_steps):
+                flat = self.flat_groups[i]
+                params_with_grad = [flat['params']]
+                grads = [gather_grads(group['params'], flat['grad'])]
+                for key in keys:
+                    buffers[key] = [flat[key]]
+                state_steps = state_steps[:1]
+
+            if not group.get('quantize_state', False):
+                self.update(group, hyper, params_with_grad, grads, buffers,
+                            state_steps)
+                continue
+
+            # 8-bit state is dequantized one parameter at a time
+            for p, grad, step in zip(params_with_grad, grads, state_steps):
+                state = self.state[p]
+                dequantized = dequantize_state(state, self.STATE, p)
+                self.update(
+                    group, hyper, [p], [grad], {
+                        key: [dequantized[key]] if key in dequantized else []
+                        for key in self.STATE
+                    }, [step])
+                requantize_state_(state, self.STATE, dequantized)
+
+        return loss
@@ -0,0 +1,89 @@
+import torch as T
+from torch.optim.optimizer import Optimizer
+
+from .groups import sync_hyperparameters
+
+
+class BackwardOptimizer(Optimizer):
+    """Applies the update of every parameter as soon as its gradient is ready.
+
+    One instance of ``optimizer_class`` is built for every parameter, and a
+    post-accumulate-grad hook runs its step from inside ``backward`` and then
+    drops the gradient. The gradients of the whole model are therefore never
+    alive at once, and the updates overlap with the rest of the backward
+    pass. ``step`` only evaluates the closure, if any::
+
+        >>> optimizer = BackwardOptimizer(model.parameters(), NNAdam,
+        ...                               u_func=M_ABS(), lr_out=1e-3)
+        >>> loss_fn(model(input), target).backward()  # updates the model
+        >>> optimizer.step()  # a no-op, kept for the training loop
+
+    Hyperparameters changed in ``param_groups``, e.g. by a scheduler, are
+    picked up by the next update. Options that take effect when the group
+    is built, such as ``u_func`` or ``stochastic_rounding``, are not.
+    Gradient clipping over the whole model is not possible in this mode,
+    since no step sees all the gradients. Requires PyTorch 2.1 or later.
+
+    Arguments:
+        params (iterable): iterable of parameters to optimize or dicts defining
+            parameter groups
+        optimizer_class (type): the optimizer applied to every parameter, e.g.
+            :class:`NNAdam`, :class:`MAdagrad`, :class:`NNRMSprop` or
+            :class:`MSGD`
+        **defaults: arguments of ``optimizer_class``
+    """
+    def __init__(self, params, optimizer_class, **defaults):
+        super().__init__(params, defaults)
+
+        self.optims = {}
+        self.handles = []
+        for group in self.param_groups:
+            for p in group['params']:
+                if not p.requires_grad:
+                    continue
+                local_group = {k: v for k, v in group.items() if k != 'params'}
+                local_group['params'] = [p]
+                self.optims[p] = optimizer_class([local_group], **defaults)
+                self.handles.append(
+                    p.register_post_accumulate_grad_hook(
+                        self.make_hook(group)))
+
+    def make_hook(self, group):
+        def hook(p):
+            optim = self.optims[p]
+            sync_hyperparameters(group, optim.param_groups[0])
+            optim.step()
+            # The gradient has been consumed, free it before the next layer
+            p.grad = None
+
+        return hook
+
+    def remove_hooks(self):
+        """Detaches the optimizer from the parameters."""
+        for handle in self.handles:
+            handle.remove()
+        self.handles = []
+
+    def state_dict(self):
+        return {
+            'optims': [optim.state_dict() for optim in self.optims.values()]
+        }
+
+    def load_state_dict(self, state_dict):
+        for optim, local_state in zip(self.optims.values(),
+                                      state_dict['optims']):
+            optim.load_state_dict(local_state)
+
+    def step(self, closure=None):
+        """Evaluates the closure, which also updates the parameters.
+
+        Arguments:
+            closure (callable, optional): A closure that reevaluates the model
+                and returns the loss.
+        """
+        loss = None
+        if closure is not None:
+            with T.enable_grad():
+                loss = closure()
+
+        return loss
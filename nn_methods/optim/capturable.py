@@ -0,0 +1,56 @@
+import torch as T
+
+
+def step_tensor(p):
+    """A step counter living on the device of ``p``."""
+    return T.zeros((), dtype=T.float32, device=p.device)
+
+
+class HyperTensors(object):
+    """0-d tensor copies of the learning rates and ``g`` of every group.
+
+    The copies live on the device of the group and are refreshed in place at
+    every step, so compiled kernels see tensors whose values change rather
+    than new Python floats, and do not recompile when a scheduler updates
+    them. Values that are already tensors are used as they are, which lets
+    a captured step read hyperparameters updated in place by the caller.
+    """
+    def __init__(self, keys=('lr_in', 'lr_out', 'g')):
+        self.keys = keys
+        self.tensors = {}
+
+    def __call__(self, i, group):
+        """Returns the hyperparameters of the ``i``-th group as tensors."""
+        device = group['params'][0].device
+        if i not in self.tensors:
+            self.tensors[i] = {
+                k: T.zeros((), dtype=T.float32, device=device)
+                for k in self.keys
+            }
+        tensors = {}
+        for k, t in self.tensors[i].items():
+            if isinstance(group[k], T.Tensor):
+                tensors[k] = group[k]
+            else:
+                tensors[k] = t.fill_(group[k])
+        return tensors
+
+    def __repr__(self):
+        return "HyperTensors({})".format(", ".join(self.keys))
+
+
+def restore_steps_(optimizer):
+    """Turns the steps of capturable groups into tensors after a load.
+
+    A state saved without ``capturable`` holds Python numbers, and older
+    PyTorch releases load tensor steps on the CPU.
+    """
+    for group in optimizer.param_groups:
+        if not group['capturable']:
+            continue
+        for p in group['params']:
+            state = optimizer.state[p]
+            if 'step' in state:
+                state['step'] = T.as_tensor(state['step'],
+                                            dtype=T.float32,
+                                            device=p.device)
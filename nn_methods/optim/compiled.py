@@ -0,0 +1,209 @@
+import warnings
+
+import torch as T
+
+from .updates import ADD, H_ABS, M_ABS, M_SPOW, N_ABS, N_Clip
+
+
+def h_abs(p, grad, lr_in=1.0, lr_out=1.0, lr=1.0, g=1.0):
+    p.add_(p.abs() * (grad * lr_in).tanh() * -lr_out * g +
+           grad * -lr * (1.0 - g))
+
+
+def m_abs(p, grad, lr_in=1, lr_out=1, g=None):
+    p.sub_(p.abs() * (grad * lr_in).tanh() * lr_out)
+
+
+def add(p, grad, lr_in=1.0, lr_out=1.0, lr=1.0, g=None):
+    p.sub_(grad * lr)
+
+
+def m_spow(p, grad, lr_in=1, lr_out=1, g=None):
+    p.mul_(T.pow(2, (grad * lr_in).tanh() * lr_out * -p.sign()))
+
+
+def n_clip(p, grad, lr):
+    p.sub_(grad * lr).clamp_min_(0)
+
+
+def n_abs(p, grad, lr):
+    p.sub_(grad * lr).abs_()
+
+
+# Elementwise kernels of the update rules, written without ``alpha=`` and
+# ``value=`` arguments so that their scalars can be passed as tensors
+RULE_KERNELS = {
+    H_ABS: h_abs,
+    M_ABS: m_abs,
+    ADD: add,
+    M_SPOW: m_spow,
+    N_Clip: n_clip,
+    N_ABS: n_abs,
+}
+
+
+def rule_kernel(u_func):
+    """Returns the kernel of ``u_func`` or ``None`` for unknown rules."""
+    if isinstance(u_func, CompiledRule):
+        u_func = u_func.rule
+    return RULE_KERNELS.get(type(u_func))
+
+
+def adam_kernel(rule, param, grad, exp_avg, exp_avg_sq, max_exp_avg_sq,
+                amsgrad, beta1, beta2, bias_correction2, weight_decay, eps,
+                **kwargs):
+    if weight_decay != 0:
+        grad = grad + param * weight_decay
+    exp_avg.mul_(beta1).add_(grad * (1 - beta1))
+    exp_avg_sq.mul_(beta2).add_(grad * grad * (1 - beta2))
+    if amsgrad:
+        max_exp_avg_sq.copy_(T.maximum(max_exp_avg_sq, exp_avg_sq))
+        exp_avg_sq = max_exp_avg_sq
+    denom = exp_avg_sq.sqrt() / bias_correction2.sqrt() + eps
+    rule(param, exp_avg / denom, **kwargs)
+
+
+def rmsprop_kernel(rule, param, grad, square_avg, grad_avg, momentum_buffer,
+                   alpha, eps, weight_decay, momentum, centered, **kwargs):
+    if weight_decay != 0:
+        grad = grad + param * weight_decay
+    square_avg.mul_(alpha).add_(grad * grad * (1 - alpha))
+    if centered:
+        grad_avg.mul_(alpha).add_(grad * (1 - alpha))
+        avg = (square_avg - grad_avg * grad_avg).sqrt() + eps
+    else:
+        avg = square_avg.sqrt() + eps
+    if momentum > 0:
+        momentum_buffer.mul_(momentum).add_(grad / avg)
+        rule(param, momentum_buffer, **kwargs)
+    else:
+        rule(param, grad / avg, **kwargs)
+
+
+def adagrad_kernel(rule, param, grad, state_sum, weight_decay, eps,
+                   **kwargs):
+    if weight_decay != 0:
+        grad = grad + param * weight_decay
+    state_sum.add_(grad * grad)
+    rule(param, grad / (state_sum.sqrt() + eps), **kwargs)
+
+
+class KernelCache(object):
+    """Compiled kernels keyed by (kernel, rule, dtype, device, contiguity).
+
+    Each key gets its own ``torch.compile`` artifact so that the tensors it
+    sees never force a recompilation of another one. If ``torch.compile`` is
+    missing or fails for a key, that key runs eagerly from then on.
+    """
+    def __init__(self):
+        self.kernels = {}
+
+    def __call__(self, kernel, rule, *args, **kwargs):
+        tensors = [a for a in args if isinstance(a, T.Tensor)]
+        key = (kernel, rule, tensors[0].dtype, tensors[0].device,
+               all(t.is_contiguous() for t in tensors))
+        if key not in self.kernels:
+            eager = kernel if rule is None else _bind(kernel, rule)
+            self.kernels[key] = (eager, _compile(eager))
+        eager, compiled = self.kernels[key]
+        if compiled is None:
+            return eager(*args, **kwargs)
+        try:
+            return compiled(*args, **kwargs)
+        except Exception as e:
+            warnings.warn("Compiling {} failed, running it eagerly: "
+                          "{}".format(kernel.__name__, e))
+            self.kernels[key] = (eager, None)
+            return eager(*args, **kwargs)
+
+    def clear(self):
+        self.kernels = {}
+
+
+kernel_cache = KernelCache()
+
+
+def _bind(kernel, rule):
+    def bound(*args, **kwargs):
+        return kernel(rule, *args, **kwargs)
+
+    bound.__name__ = kernel.__name__
+    return bound
+
+
+def _compile(fn):
+    if not hasattr(T, 'compile'):
+        return None
+    return T.compile(fn, dynamic=True)
+
+
+def scalar(x):
+    """Wraps a Python number into a 0-d tensor.
+
+    Compiled kernels specialize on Python floats, so every new learning rate
+    or bias correction would recompile them. Tensors are traced instead.
+    """
+    if isinstance(x, (int, float)) and not isinstance(x, bool):
+        return T.tensor(float(x))
+    return x
+
+
+def scalars(kwargs):
+    return {k: scalar(v) for k, v in kwargs.items()}
+
+
+class CompiledRule(object):
+    """Runs an update rule through a compiled kernel.
+
+    ``tanh_part``, ``update`` and the ``foreach`` variants are taken from the
+    wrapped rule.
+    """
+    def __init__(self, rule):
+        if type(rule) not in RULE_KERNELS:
+            raise ValueError("No compiled kernel for {}".format(rule))
+        self.rule = rule
+        self.kernel = RULE_KERNELS[type(rule)]
+
+    @T.no_grad()
+    def __call__(self, p, grad, workspace=None, **kwargs):
+        kernel_cache(self.kernel, None, p, grad, **scalars(kwargs))
+
+    def __getattr__(self, name):
+        if name == 'rule':
+            raise AttributeError(name)
+        return getattr(self.rule, name)
+
+    def __repr__(self):
+        return "Compiled({})".format(self.rule)
+
+
+def adam_step(u_func, param, grad, exp_avg, exp_avg_sq, max_exp_avg_sq,
+              step, amsgrad, beta1, beta2, weight_decay, eps, **kwargs):
+    """Runs the Adam update of one parameter as a single compiled kernel."""
+    kernel_cache(adam_kernel, rule_kernel(u_func), param, grad, exp_avg,
+                 exp_avg_sq, max_exp_avg_sq, amsgrad, beta1, beta2,
+                 scalar(1 - beta2**step), weight_decay, eps, **scalars(kwargs))
+
+
+def rmsprop_step(u_func, param, grad, square_avg, grad_avg, momentum_buffer,
+                 alpha, eps, weight_decay, momentum, centered, **kwargs):
+    """Runs the RMSprop update of one parameter as a single compiled kernel."""
+    kernel_cache(rmsprop_kernel, rule_kernel(u_func), param, grad, square_avg,
+                 grad_avg, momentum_buffer, alpha, eps, weight_decay,
+                 momentum, centered, **scalars(kwargs))
+
+
+def adagrad_step(u_func, param, grad, state_sum, weight_decay, eps, **kwargs):
+    """Runs the dense Adagrad update of one parameter as a compiled kernel."""
+    kernel_cache(adagrad_kernel, rule_kernel(u_func), param, grad, state_sum,
+                 weight_decay, eps, **scalars(kwargs))
+
+
+def run_kernel(kernel, rule, compiled, *args, **kwargs):
+    """Runs ``kernel`` bound to ``rule``, through the cache if ``compiled``.
+
+    Eagerly the kernels accept 0-d tensors for all their scalars as well.
+    """
+    if compiled:
+        return kernel_cache(kernel, rule, *args, **kwargs)
+    return kernel(rule, *args, **kwargs)
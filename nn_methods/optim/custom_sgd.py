@@ -1,6 +1,11 @@
 import torch as T
 from torch.optim.optimizer import Optimizer, required
 
+from .functional import sgd
+from .groups import check_packed
+from .hogwild import (momentum_buffer, preallocate_momentum_buffer_,
+                      share_memory_, store_momentum_buffer_)
+
 
 class CustomSGD(Optimizer):
     r"""Implements stochastic gradient descent (optionally with momentum).
@@ -84,6 +89,19 @@ class CustomSGD(Optimizer):
         for group in self.param_groups:
             group.setdefault('nesterov', False)
 
+    def init_state(self, p, group):
+        state = self.state[p]
+        if group['momentum'] != 0:
+            preallocate_momentum_buffer_(state, p)
+
+    def share_memory(self):
+        """Allocates the state of every parameter in shared memory."""
+        share_memory_(self)
+
+    def add_param_group(self, param_group):
+        super().add_param_group(param_group)
+        check_packed(self.param_groups[-1])
+
     @T.no_grad()
     def step(self, closure=None):
         """Performs a single optimization step.
@@ -98,30 +116,30 @@ class CustomSGD(Optimizer):
                 loss = closure()
 
         for group in self.param_groups:
-            weight_decay = group['weight_decay']
-            momentum = group['momentum']
-            dampening = group['dampening']
-            nesterov = group['nesterov']
+            params_with_grad = []
+            d_p_list = []
+            momentum_buffer_list = []
 
             for p in group['params']:
-                if p.grad is None:
-                    continue
-                d_p = p.grad
-                if weight_decay != 0:
-                    d_p = d_p.add(p, alpha=weight_decay)
-                if momentum != 0:
-                    param_state = self.state[p]
-                    if 'momentum_buffer' not in param_state:
-                        buf = param_state['momentum_buffer'] = T.clone(
-                            d_p).detach()
-                    else:
-                        buf = param_state['momentum_buffer']
-                        buf.mul_(momentum).add_(d_p, alpha=1 - dampening)
-                    if nesterov:
-                        d_p = d_p.add(buf, alpha=momentum)
-                    else:
-                        d_p = buf
-
-                group['u_func'](p, d_p, lr=group['lr'])
+                if p.grad is not None:
+                    params_with_grad.append(p)
+                    d_p_list.append(p.grad)
+                    state = self.state[p]
+                    momentum_buffer_list.append(momentum_buffer(state))
+
+            sgd(params_with_grad,
+                d_p_list,
+                momentum_buffer_list,
+                group['u_func'],
+                group['weight_decay'],
+                group['momentum'],
+                group['dampening'],
+                group['nesterov'],
+                lr=group['lr'])
+
+            # Keep the buffers created by this step
+            for p, buf in zip(params_with_grad, momentum_buffer_list):
+                if buf is not None:
+                    store_momentum_buffer_(self.state[p], buf)
 
         return loss
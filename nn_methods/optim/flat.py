@@ -0,0 +1,104 @@
+import torch as T
+
+
+def flat_views(flat, tensors):
+    """Splits the 1-D tensor ``flat`` into views shaped like ``tensors``."""
+    views = []
+    offset = 0
+    for t in tensors:
+        numel = t.numel()
+        views.append(flat[offset:offset + numel].view_as(t))
+        offset += numel
+    return views
+
+
+@T.no_grad()
+def flatten(tensors):
+    return T.cat([t.reshape(-1) for t in tensors])
+
+
+@T.no_grad()
+def flatten_params(params):
+    """Moves ``params`` into one contiguous 1-D tensor.
+
+    Every parameter keeps its identity but its data becomes a view of the
+    returned tensor.
+    """
+    for p in params:
+        if p.dtype != params[0].dtype or p.device != params[0].device:
+            raise ValueError(
+                "Flat mode requires all the parameters of a group to have "
+                "the same dtype and device")
+    flat = flatten(params)
+    for p, view in zip(params, flat_views(flat, params)):
+        p.data = view
+    return flat
+
+
+def is_flat(params, flat):
+    """Whether ``params`` still live in the flat storage ``flat`` built for
+    them by :func:`flatten_params`.
+
+    ``model.to()``, ``model.half()`` or an assignment to ``p.data`` move a
+    parameter to new storage, after which a step on ``flat`` would no
+    longer reach it. Every parameter must start at its own offset in
+    ``flat``, with the same dtype.
+    """
+    if flat is None:
+        return False
+    offset = flat.data_ptr()
+    for p in params:
+        if p.dtype != flat.dtype or p.data_ptr() != offset:
+            return False
+        offset += p.numel() * p.element_size()
+    return True
+
+
+@T.no_grad()
+def flatten_state(state, params, keys):
+    """Packs ``state[p][key]`` of every parameter into one tensor per key.
+
+    The per-parameter entries are replaced by views of the packed tensors,
+    so the rest of the optimizer keeps working on them unchanged.
+    """
+    flats = {}
+    for key in keys:
+        flat = flatten([state[p][key] for p in params])
+        for p, view in zip(params, flat_views(flat, params)):
+            state[p][key] = view
+        flats[key] = flat
+    return flats
+
+
+@T.no_grad()
+def gather_grads(params, flat):
+    """Copies the gradients of ``params`` into ``flat``.
+
+    The gradients are then replaced by views of ``flat``, so a following
+    backward that does not reset them accumulates there directly and the
+    copy is skipped.
+    """
+    views = flat_views(flat, params)
+    packed = [
+        p.grad.data_ptr() == view.data_ptr() for p, view in zip(params, views)
+    ]
+    if not any(packed):
+        T.cat([p.grad.reshape(-1) for p in params], out=flat)
+    else:
+        for p, view, is_view in zip(params, views, packed):
+            if not is_view:
+                view.copy_(p.grad)
+    for p, view in zip(params, views):
+        p.grad = view
+    return flat
+
+
+def can_step_flat(params, params_with_grad, state_steps):
+    """Whether a group can be updated through its flat buffers.
+
+    This needs a dense gradient for every parameter and all the parameters
+    at the same step, otherwise the per-parameter path is used.
+    """
+    return (len(params_with_grad) == len(params)
+            and not any(p.grad.is_sparse for p in params)
+            and all(step == state_steps[0] for step in state_steps))
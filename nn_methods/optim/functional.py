@@ -0,0 +1,620 @@
+import math
+from typing import List, Optional
+
+import torch as T
+from torch import Tensor
+
+from .compiled import (adagrad_kernel, adagrad_step, adam_kernel, adam_step,
+                       rmsprop_kernel, rmsprop_step, rule_kernel, run_kernel)
+from .parallel import parallel_apply
+from .sparse import gather_rows, scatter_rows_, sparse_rows
+from .updates import foreach_tanh_part, foreach_u_func, foreach_update
+from .workspace import scratch
+
+# Every optimizer of the package is a front end over one of the functions
+# below. They take the tensor lists of a whole group and update them either
+# one tensor at a time or, with ``foreach``, with batched ``torch._foreach_*``
+# kernels. The hybrid optimizers pass the extra ``lr`` of their rules.
+
+
+def rule_kwargs(lr_in, lr_out, g, lr=None):
+    kwargs = dict(lr_in=lr_in, lr_out=lr_out, g=g)
+    if lr is not None:
+        kwargs['lr'] = lr
+    return kwargs
+
+
+def check_capturable(grads):
+    if any(grad.is_sparse for grad in grads):
+        raise RuntimeError("capturable does not support sparse gradients")
+
+
+def can_foreach(foreach, grads, compiled=False):
+    """Whether a group can be updated with the ``torch._foreach_*`` kernels.
+
+    Sparse gradients and compiled kernels take the per-tensor path.
+    """
+    return (foreach and not compiled and len(grads) > 0
+            and not any(grad.is_sparse for grad in grads))
+
+
+def can_parallel(num_threads, params, compiled=False):
+    """Whether a group is split across ``num_threads`` threads.
+
+    Compiled kernels are traced lazily, which is not thread safe, so their
+    groups are updated from the calling thread.
+    """
+    return num_threads > 1 and len(params) > 1 and not compiled
+
+
+def sgd(
+    params: List[Tensor],
+    d_p_list: List[Tensor],
+    momentum_buffer_list: List[Optional[Tensor]],
+    u_func,
+    weight_decay: float,
+    momentum: float,
+    dampening: float,
+    nesterov: bool,
+    momentum_type: Optional[str] = None,
+    nesterov_first_step: bool = True,
+    foreach: bool = False,
+    workspace=None,
+    num_threads: int = 1,
+    **kwargs,
+):
+    r"""Functional API that performs SGD algorithm computation.
+
+    See :class:`~torch.optim.SGD` for details. ``kwargs`` are the learning
+    rates of ``u_func``. Entries of ``momentum_buffer_list`` that are
+    ``None`` are replaced by the new buffers, which the caller stores. With
+    the ``'tanh'`` momentum type the buffer accumulates the tanh part of the
+    rule and a new buffer does not update its parameter. Without
+    ``nesterov_first_step`` a new buffer steps its parameter with the plain
+    gradient, as MSGD and HMSGD do, instead of the Nesterov lookahead. With
+    ``num_threads`` the group is updated in balanced chunks from a pool of
+    threads.
+    """
+    if can_parallel(num_threads, params):
+        parallel_apply(sgd,
+                       num_threads,
+                       [params, d_p_list, momentum_buffer_list],
+                       u_func,
+                       weight_decay,
+                       momentum,
+                       dampening,
+                       nesterov,
+                       momentum_type=momentum_type,
+                       nesterov_first_step=nesterov_first_step,
+                       foreach=foreach,
+                       workspace=workspace,
+                       **kwargs)
+        return
+    if can_foreach(foreach, d_p_list):
+        _foreach_sgd(params, d_p_list, momentum_buffer_list, u_func,
+                     weight_decay, momentum, dampening, nesterov,
+                     momentum_type, nesterov_first_step, **kwargs)
+        return
+
+    tanh = momentum_type == 'tanh'
+    for i, param in enumerate(params):
+        d_p = d_p_list[i]
+        buffers, scratch_kwargs = scratch(workspace, param)
+        if weight_decay != 0:
+            d_p = T.add(d_p, param, alpha=weight_decay, out=buffers[0])
+
+        if momentum != 0:
+            buf = momentum_buffer_list[i]
+            lookahead = nesterov
+            if buf is None:
+                buf = momentum_buffer_list[i] = T.clone(d_p).detach()
+                if tanh:
+                    continue
+                lookahead = nesterov and nesterov_first_step
+            elif tanh:
+                buf.mul_(momentum).add_(u_func.tanh_part(d_p, kwargs['lr_in']),
+                                        alpha=1 - dampening)
+            else:
+                buf.mul_(momentum).add_(d_p, alpha=1 - dampening)
+            if lookahead:
+                d_p = T.add(d_p, buf, alpha=momentum, out=buffers[0])
+            else:
+                d_p = buf
+
+        if tanh and momentum != 0:
+            u_func.update(param, d_p, lr_out=kwargs['lr_out'])
+        else:
+            u_func(param, d_p, **kwargs, **scratch_kwargs)
+            # -> param.add_(d_p, alpha=-lr)
+
+
+def _foreach_sgd(params, d_p_list, momentum_buffer_list, u_func, weight_decay,
+                 momentum, dampening, nesterov, momentum_type,
+                 nesterov_first_step, **kwargs):
+    if weight_decay != 0:
+        d_p_list = T._foreach_add(d_p_list, params, alpha=weight_decay)
+
+    if momentum == 0:
+        foreach_u_func(u_func, params, d_p_list, **kwargs)
+        return
+
+    # Parameters seen for the first time only get their buffer created
+    new = [buf is None for buf in momentum_buffer_list]
+    old_params, old_d_ps, old_bufs = [], [], []
+    for i, (p, d_p) in enumerate(zip(params, d_p_list)):
+        if momentum_buffer_list[i] is None:
+            momentum_buffer_list[i] = T.clone(d_p).detach()
+        else:
+            old_params.append(p)
+            old_d_ps.append(d_p)
+            old_bufs.append(momentum_buffer_list[i])
+
+    tanh = momentum_type == 'tanh'
+    if len(old_bufs) > 0:
+        T._foreach_mul_(old_bufs, momentum)
+        if tanh:
+            T._foreach_add_(old_bufs,
+                            foreach_tanh_part(u_func, old_d_ps,
+                                              kwargs['lr_in']),
+                            alpha=1 - dampening)
+        else:
+            T._foreach_add_(old_bufs, old_d_ps, alpha=1 - dampening)
+
+    if tanh:
+        params, d_p_list, bufs = old_params, old_d_ps, old_bufs
+        if len(params) == 0:
+            return
+    else:
+        bufs = momentum_buffer_list
+    if nesterov:
+        d_p_list = T._foreach_add(d_p_list, bufs, alpha=momentum)
+        if not (tanh or nesterov_first_step):
+            # New buffers step their parameters with the plain gradient
+            d_p_list = [
+                buf if is_new else d_p
+                for d_p, buf, is_new in zip(d_p_list, bufs, new)
+            ]
+    else:
+        d_p_list = bufs
+
+    if tanh:
+        foreach_update(u_func, params, d_p_list, lr_out=kwargs['lr_out'])
+    else:
+        foreach_u_func(u_func, params, d_p_list, **kwargs)
+
+
+def adam(
+    params: List[Tensor],
+    grads: List[Tensor],
+    exp_avgs: List[Tensor],
+    exp_avg_sqs: List[Tensor],
+    max_exp_avg_sqs: List[Tensor],
+    state_steps: List[int],
+    u_func,
+    amsgrad: bool,
+    beta1: float,
+    beta2: float,
+    lr_in: float,
+    lr_out: float,
+    g: float,
+    weight_decay: float,
+    eps: float,
+    lr: Optional[float] = None,
+    compiled: bool = False,
+    workspace=None,
+    foreach: bool = False,
+    capturable: bool = False,
+    num_threads: int = 1,
+):
+    r"""Functional API that performs Adam algorithm computation.
+
+    See :class:`~torch.optim.Adam` for details. With ``capturable`` the steps
+    and the hyperparameters of the rule are 0-d tensors, see
+    :func:`capturable_adam`. With ``num_threads`` the group is updated in
+    balanced chunks from a pool of threads.
+    """
+    if capturable:
+        capturable_adam(params, grads, exp_avgs, exp_avg_sqs, max_exp_avg_sqs,
+                        state_steps, u_func, amsgrad, beta1, beta2, lr_in,
+                        lr_out, g, weight_decay, eps, lr, compiled)
+        return
+    if can_parallel(num_threads, params, compiled):
+        parallel_apply(adam,
+                       num_threads, [
+                           params, grads, exp_avgs, exp_avg_sqs,
+                           max_exp_avg_sqs, state_steps
+                       ],
+                       u_func,
+                       amsgrad,
+                       beta1,
+                       beta2,
+                       lr_in,
+                       lr_out,
+                       g,
+                       weight_decay,
+                       eps,
+                       lr,
+                       workspace=workspace,
+                       foreach=foreach)
+        return
+
+    if can_foreach(foreach, grads, compiled):
+        for idx in _by_step(state_steps):
+            _foreach_adam([params[i] for i in idx], [grads[i] for i in idx],
+                          [exp_avgs[i] for i in idx],
+                          [exp_avg_sqs[i] for i in idx],
+                          [max_exp_avg_sqs[i] for i in idx] if amsgrad else [],
+                          state_steps[idx[0]], u_func, amsgrad, beta1, beta2,
+                          weight_decay, eps, lr_in, lr_out, g, lr)
+        return
+
+    for i, param in enumerate(params):
+        grad = grads[i]
+        exp_avg = exp_avgs[i]
+        exp_avg_sq = exp_avg_sqs[i]
+        step = state_steps[i]
+
+        if grad.is_sparse:
+            # Lazy update: only the rows present in the gradient and their
+            # state are read and written
+            rows, values = sparse_rows(grad)
+            tensors = [
+                param, exp_avg, exp_avg_sq,
+                max_exp_avg_sqs[i] if amsgrad else None
+            ]
+            dense = gather_rows(rows, grad, tensors)
+            adam(dense[:1], [values], dense[1:2], dense[2:3], dense[3:],
+                 [step], u_func, amsgrad, beta1, beta2, lr_in, lr_out, g,
+                 weight_decay, eps, lr, compiled, workspace)
+            scatter_rows_(rows, grad, tensors, dense)
+            continue
+
+        buffers, kwargs = scratch(workspace, param)
+
+        bias_correction1 = 1 - beta1**step
+        bias_correction2 = 1 - beta2**step
+        step_kwargs = rule_kwargs(
+            lr_in, lr_out / bias_correction1, g,
+            None if lr is None else lr / bias_correction1)
+
+        if compiled and rule_kernel(u_func) is not None:
+            adam_step(u_func, param, grad, exp_avg, exp_avg_sq,
+                      max_exp_avg_sqs[i] if amsgrad else None, step, amsgrad,
+                      beta1, beta2, weight_decay, eps, **step_kwargs)
+            continue
+
+        if weight_decay != 0:
+            grad = T.add(grad, param, alpha=weight_decay, out=buffers[1])
+
+        # Decay the first and second moment running average coefficient
+        exp_avg.mul_(beta1).add_(grad, alpha=1 - beta1)
+        exp_avg_sq.mul_(beta2).addcmul_(grad, grad, value=1 - beta2)
+        if amsgrad:
+            # Maintains the maximum of all 2nd moment running avg. till now
+            T.max(max_exp_avg_sqs[i], exp_avg_sq, out=max_exp_avg_sqs[i])
+            # Use the max. for normalizing running avg. of gradient
+            denom = T.sqrt(max_exp_avg_sqs[i], out=buffers[0])
+        else:
+            denom = T.sqrt(exp_avg_sq, out=buffers[0])
+        denom.div_(math.sqrt(bias_correction2)).add_(eps)
+
+        u_func(param, T.div(exp_avg, denom, out=denom), **step_kwargs,
+               **kwargs)
+        # -> param.addcdiv_(exp_avg, denom, value=-step_size)
+
+
+def _foreach_adam(params, grads, exp_avgs, exp_avg_sqs, max_exp_avg_sqs, step,
+                  u_func, amsgrad, beta1, beta2, weight_decay, eps, lr_in,
+                  lr_out, g, lr):
+    bias_correction1 = 1 - beta1**step
+    bias_correction2 = 1 - beta2**step
+
+    if weight_decay != 0:
+        grads = T._foreach_add(grads, params, alpha=weight_decay)
+
+    T._foreach_mul_(exp_avgs, beta1)
+    T._foreach_add_(exp_avgs, grads, alpha=1 - beta1)
+    T._foreach_mul_(exp_avg_sqs, beta2)
+    T._foreach_addcmul_(exp_avg_sqs, grads, grads, value=1 - beta2)
+    if amsgrad:
+        T._foreach_maximum_(max_exp_avg_sqs, exp_avg_sqs)
+        denom = T._foreach_sqrt(max_exp_avg_sqs)
+    else:
+        denom = T._foreach_sqrt(exp_avg_sqs)
+    T._foreach_div_(denom, math.sqrt(bias_correction2))
+    T._foreach_add_(denom, eps)
+
+    foreach_u_func(
+        u_func, params, T._foreach_div(exp_avgs, denom),
+        **rule_kwargs(lr_in, lr_out / bias_correction1, g,
+                      None if lr is None else lr / bias_correction1))
+
+
+def capturable_adam(params, grads, exp_avgs, exp_avg_sqs, max_exp_avg_sqs,
+                    state_steps, u_func, amsgrad, beta1, beta2, lr_in, lr_out,
+                    g, weight_decay, eps, lr, compiled):
+    """Adam on tensor steps and hyperparameters, with no host round trip.
+
+    The bias corrections of all the parameters are computed in one pass over
+    the step tensors, and each parameter is updated by the kernel of its
+    rule, so nothing in the step depends on the value of a Python number.
+    """
+    check_capturable(grads)
+    bias_corrections1 = T._foreach_pow(beta1, state_steps)
+    T._foreach_neg_(bias_corrections1)
+    T._foreach_add_(bias_corrections1, 1)
+    bias_corrections2 = T._foreach_pow(beta2, state_steps)
+    T._foreach_neg_(bias_corrections2)
+    T._foreach_add_(bias_corrections2, 1)
+
+    rule = rule_kernel(u_func)
+    for i, param in enumerate(params):
+        bias_correction1 = bias_corrections1[i]
+        run_kernel(adam_kernel,
+                   rule,
+                   compiled,
+                   param,
+                   grads[i],
+                   exp_avgs[i],
+                   exp_avg_sqs[i],
+                   max_exp_avg_sqs[i] if amsgrad else None,
+                   amsgrad,
+                   beta1,
+                   beta2,
+                   bias_corrections2[i],
+                   weight_decay,
+                   eps,
+                   **rule_kwargs(lr_in, lr_out / bias_correction1, g,
+                                 None if lr is None else lr /
+                                 bias_correction1))
+
+
+def rmsprop(
+    params: List[Tensor],
+    grads: List[Tensor],
+    square_avgs: List[Tensor],
+    grad_avgs: List[Tensor],
+    momentum_buffer_list: List[Tensor],
+    u_func,
+    lr_in: float,
+    lr_out: float,
+    g: float,
+    alpha: float,
+    eps: float,
+    weight_decay: float,
+    momentum: float,
+    centered: bool,
+    lr: Optional[float] = None,
+    compiled: bool = False,
+    workspace=None,
+    foreach: bool = False,
+    capturable: bool = False,
+    num_threads: int = 1,
+):
+    r"""Functional API that performs RMSprop algorithm computation.
+
+    See :class:`~torch.optim.RMSprop` for details. With ``capturable`` the
+    hyperparameters of the rule may be 0-d tensors. With ``num_threads`` the
+    group is updated in balanced chunks from a pool of threads.
+    """
+    step_kwargs = rule_kwargs(lr_in, lr_out, g, lr)
+    if capturable:
+        check_capturable(grads)
+        for i, param in enumerate(params):
+            run_kernel(rmsprop_kernel, rule_kernel(u_func), compiled, param,
+                       grads[i], square_avgs[i],
+                       grad_avgs[i] if centered else None,
+                       momentum_buffer_list[i] if momentum > 0 else None,
+                       alpha, eps, weight_decay, momentum, centered,
+                       **step_kwargs)
+        return
+    if can_parallel(num_threads, params, compiled):
+        parallel_apply(rmsprop,
+                       num_threads, [
+                           params, grads, square_avgs, grad_avgs,
+                           momentum_buffer_list
+                       ],
+                       u_func,
+                       lr_in,
+                       lr_out,
+                       g,
+                       alpha,
+                       eps,
+                       weight_decay,
+                       momentum,
+                       centered,
+                       lr,
+                       workspace=workspace,
+                       foreach=foreach)
+        return
+    if can_foreach(foreach, grads, compiled):
+        _foreach_rmsprop(params, grads, square_avgs, grad_avgs,
+                         momentum_buffer_list, u_func, alpha, eps,
+                         weight_decay, momentum, centered, **step_kwargs)
+        return
+
+    for i, param in enumerate(params):
+        grad = grads[i]
+        square_avg = square_avgs[i]
+
+        if grad.is_sparse:
+            # Lazy update: only the rows present in the gradient and their
+            # state are read and written
+            rows, values = sparse_rows(grad)
+            tensors = [
+                param, square_avg, grad_avgs[i] if centered else None,
+                momentum_buffer_list[i] if momentum > 0 else None
+            ]
+            dense = gather_rows(rows, grad, tensors)
+            rmsprop(dense[:1], [values], dense[1:2], dense[2:3], dense[3:],
+                    u_func, lr_in, lr_out, g, alpha, eps, weight_decay,
+                    momentum, centered, lr, compiled, workspace)
+            scatter_rows_(rows, grad, tensors, dense)
+            continue
+
+        buffers, kwargs = scratch(workspace, param)
+
+        if compiled and rule_kernel(u_func) is not None:
+            rmsprop_step(u_func, param, grad, square_avg,
+                         grad_avgs[i] if centered else None,
+                         momentum_buffer_list[i] if momentum > 0 else None,
+                         alpha, eps, weight_decay, momentum, centered,
+                         **step_kwargs)
+            continue
+
+        if weight_decay != 0:
+            grad = T.add(grad, param, alpha=weight_decay, out=buffers[1])
+
+        square_avg.mul_(alpha).addcmul_(grad, grad, value=1 - alpha)
+
+        if centered:
+            grad_avg = grad_avgs[i]
+            grad_avg.mul_(alpha).add_(grad, alpha=1 - alpha)
+            avg = T.addcmul(square_avg,
+                            grad_avg,
+                            grad_avg,
+                            value=-1,
+                            out=buffers[0]).sqrt_().add_(eps)
+        else:
+            avg = T.sqrt(square_avg, out=buffers[0]).add_(eps)
+
+        if momentum > 0:
+            buf = momentum_buffer_list[i]
+            buf.mul_(momentum).addcdiv_(grad, avg)
+            u_func(param, buf, **step_kwargs, **kwargs)
+            # -> param.add_(buf, alpha=-lr)
+        else:
+            u_func(param, T.div(grad, avg, out=avg), **step_kwargs, **kwargs)
+            # -> param.addcdiv_(grad, avg, value=-lr)
+
+
+def _foreach_rmsprop(params, grads, square_avgs, grad_avgs,
+                     momentum_buffer_list, u_func, alpha, eps, weight_decay,
+                     momentum, centered, **kwargs):
+    if weight_decay != 0:
+        grads = T._foreach_add(grads, params, alpha=weight_decay)
+
+    T._foreach_mul_(square_avgs, alpha)
+    T._foreach_addcmul_(square_avgs, grads, grads, value=1 - alpha)
+
+    if centered:
+        T._foreach_mul_(grad_avgs, alpha)
+        T._foreach_add_(grad_avgs, grads, alpha=1 - alpha)
+        avg = T._foreach_addcmul(square_avgs, grad_avgs, grad_avgs, value=-1)
+        T._foreach_sqrt_(avg)
+    else:
+        avg = T._foreach_sqrt(square_avgs)
+    T._foreach_add_(avg, eps)
+
+    if momentum > 0:
+        T._foreach_mul_(momentum_buffer_list, momentum)
+        T._foreach_addcdiv_(momentum_buffer_list, grads, avg)
+        foreach_u_func(u_func, params, momentum_buffer_list, **kwargs)
+    else:
+        foreach_u_func(u_func, params, T._foreach_div(grads, avg), **kwargs)
+
+
+def adagrad(
+    params: List[Tensor],
+    grads: List[Tensor],
+    state_sums: List[Tensor],
+    state_steps: List[int],
+    u_func,
+    lr_in: float,
+    lr_out: float,
+    g: float,
+    weight_decay: float,
+    lr_decay: float,
+    eps: float,
+    lr: Optional[float] = None,
+    compiled: bool = False,
+    workspace=None,
+    foreach: bool = False,
+    capturable: bool = False,
+    num_threads: int = 1,
+):
+    r"""Functional API that performs Adagrad algorithm computation.
+
+    See :class:`~torch.optim.Adagrad` for details. With ``capturable`` the
+    hyperparameters of the rule may be 0-d tensors. With ``num_threads`` the
+    group is updated in balanced chunks from a pool of threads.
+    """
+    step_kwargs = rule_kwargs(lr_in, lr_out, g, lr)
+    if capturable:
+        check_capturable(grads)
+        for param, grad, state_sum in zip(params, grads, state_sums):
+            run_kernel(adagrad_kernel, rule_kernel(u_func), compiled, param,
+                       grad, state_sum, weight_decay, eps, **step_kwargs)
+        return
+    if can_parallel(num_threads, params, compiled):
+        parallel_apply(adagrad,
+                       num_threads,
+                       [params, grads, state_sums, state_steps],
+                       u_func,
+                       lr_in,
+                       lr_out,
+                       g,
+                       weight_decay,
+                       lr_decay,
+                       eps,
+                       lr,
+                       workspace=workspace,
+                       foreach=foreach)
+        return
+    if can_foreach(foreach, grads, compiled):
+        _foreach_adagrad(params, grads, state_sums, u_func, weight_decay, eps,
+                         **step_kwargs)
+        return
+
+    for (param, grad, state_sum, step) in zip(params, grads, state_sums,
+                                              state_steps):
+        if grad.is_sparse:
+            # Lazy update: only the rows present in the gradient and their
+            # state are read and written
+            rows, values = sparse_rows(grad)
+            tensors = [param, state_sum]
+            dense = gather_rows(rows, grad, tensors)
+            adagrad(dense[:1], [values], dense[1:], [step], u_func, lr_in,
+                    lr_out, g, weight_decay, lr_decay, eps, lr, compiled,
+                    workspace)
+            scatter_rows_(rows, grad, tensors, dense)
+            continue
+
+        if compiled and rule_kernel(u_func) is not None:
+            adagrad_step(u_func, param, grad, state_sum, weight_decay, eps,
+                         **step_kwargs)
+            continue
+
+        buffers, kwargs = scratch(workspace, param)
+        if weight_decay != 0:
+            grad = T.add(grad, param, alpha=weight_decay, out=buffers[1])
+
+        clr = lr_out / (1 + (step - 1) * lr_decay)
+
+        state_sum.addcmul_(grad, grad, value=1)
+        std = T.sqrt(state_sum, out=buffers[0]).add_(eps)
+        u_func(param, T.div(grad, std, out=std), **step_kwargs, **kwargs)
+        # -> param.addcdiv_(grad, std, value=-clr)
+
+
+def _foreach_adagrad(params, grads, state_sums, u_func, weight_decay, eps,
+                     **kwargs):
+    if weight_decay != 0:
+        grads = T._foreach_add(grads, params, alpha=weight_decay)
+
+    T._foreach_addcmul_(state_sums, grads, grads, value=1)
+    std = T._foreach_sqrt(state_sums)
+    T._foreach_add_(std, eps)
+    foreach_u_func(u_func, params, T._foreach_div(grads, std), **kwargs)
+
+
+def _by_step(state_steps):
+    """Groups the indices of ``state_steps`` by step.
+
+    The bias corrections of Adam depend on the step, so parameters that
+    joined the optimizer later are batched separately.
+    """
+    indices = {}
+    for i, step in enumerate(state_steps):
+        indices.setdefault(step, []).append(i)
+    return list(indices.values())
@@ -0,0 +1,55 @@
+import warnings
+
+import torch as T
+
+from .updates import H_ABS, M_ABS, M_SPOW, StochasticRounding
+
+# Keys of a parameter group that the optimizer acts on once, when the group
+# is added or its state is created: ``stochastic_rounding`` wraps ``u_func``,
+# ``flat`` packs the parameters, ``quantize_state`` and ``capturable`` decide
+# the form of the state. Copying them again from an outer group would undo
+# that, e.g. replace the wrapped ``u_func`` with the raw rule.
+CONSTRUCTION_KEYS = frozenset(('params', 'u_func', 'stochastic_rounding',
+                               'flat', 'quantize_state', 'capturable'))
+
+
+def sync_hyperparameters(group, local_group):
+    """Copies the hyperparameters of ``group``, e.g. set by a scheduler, to
+    the ``local_group`` of a wrapped optimizer."""
+    for k, v in group.items():
+        if k not in CONSTRUCTION_KEYS:
+            local_group[k] = v
+
+
+def updates_packed_exactly(group):
+    """Whether the rule of ``group`` updates a packed NN weight exactly as
+    the two weights it packs.
+
+    A packed weight ``w`` stands for ``relu(w)`` and ``relu(-w)``. M_ABS and
+    M_SPOW, and H_ABS at ``g = 1``, scale every entry by a factor that
+    depends on its gradient, which is odd in it, so zeros stay zero and
+    signs never change, as in the pair. Additive and clipping rules move
+    entries across zero where the pair would grow a zero weight: ``ADD``
+    and H_ABS at ``g < 1`` do, ``N_Clip`` zeroes the whole negative half
+    and ``N_ABS`` flips it. A ``g`` given as a tensor, e.g. by
+    :class:`GSchedule`, can leave 1 and is not exact either.
+    """
+    rule = group['u_func']
+    if isinstance(rule, StochasticRounding):
+        rule = rule.rule
+    if type(rule) in (M_ABS, M_SPOW):
+        return True
+    g = group.get('g', 1.0)
+    return type(rule) is H_ABS and not isinstance(g, T.Tensor) and g == 1
+
+
+def check_packed(group):
+    """Warns if ``group`` holds a packed NN weight and a rule that does not
+    update it as the unpacked pair, see :func:`updates_packed_exactly`."""
+    if not any(getattr(p, 'packed', False) for p in group['params']):
+        return
+    if not updates_packed_exactly(group):
+        warnings.warn(
+            "{} does not update packed NN weights as the unpacked pair; use "
+            "M_ABS, M_SPOW or H_ABS with g = 1, or build the layers with "
+            "packed=False".format(group['u_func']))
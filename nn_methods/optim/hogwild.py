@@ -0,0 +1,83 @@
+import torch as T
+import torch.multiprocessing as mp
+
+
+def share_memory_(optimizer):
+    """Allocates the missing state of ``optimizer`` and moves it to shared
+    memory.
+
+    The state is otherwise created lazily by the first step, in whichever
+    process runs it, and could not be shared. The steps of Adam and Adagrad
+    are Python numbers and stay private to every process, except in
+    ``capturable`` groups.
+    """
+    for group in optimizer.param_groups:
+        for p in group['params']:
+            state = optimizer.state[p]
+            if len(state) == 0:
+                optimizer.init_state(p, group)
+            for value in state.values():
+                if T.is_tensor(value):
+                    value.share_memory_()
+
+
+def preallocate_momentum_buffer_(state, p):
+    """Allocates the momentum buffer of ``p`` before its first step.
+
+    The buffer is marked as unused, so that :func:`momentum_buffer` hides it
+    from the first step, which starts it from the gradient as it does for a
+    buffer created lazily.
+    """
+    state['momentum_buffer'] = T.zeros_like(p,
+                                            memory_format=T.preserve_format)
+    state['momentum_unused'] = True
+
+
+def momentum_buffer(state):
+    """Returns the momentum buffer to pass to ``sgd``, ``None`` if it has
+    not been used by a step yet."""
+    if state.get('momentum_unused', False):
+        return None
+    return state.get('momentum_buffer')
+
+
+def store_momentum_buffer_(state, buf):
+    """Keeps the buffer ``buf`` returned by ``sgd`` in ``state``.
+
+    A preallocated buffer, which may be in shared memory, is written in
+    place rather than replaced.
+    """
+    if state.pop('momentum_unused', False):
+        state['momentum_buffer'].copy_(buf)
+    else:
+        state['momentum_buffer'] = buf
+
+
+def hogwild(fn, model, optimizer, num_processes, args=()):
+    """Trains ``model`` from ``num_processes`` lock-free processes.
+
+    The parameters and the optimizer state are moved to shared memory and
+    ``fn(rank, model, optimizer, *args)`` is run in every process. Each one
+    computes its own gradients and applies its updates to the shared tensors
+    without synchronization, as in `Hogwild!`_, so training scales over the
+    cores of one machine without a communication backend::
+
+        >>> def train(rank, model, optimizer, loader):
+        ...     for input, target in loader:
+        ...         optimizer.zero_grad()
+        ...         loss_fn(model(input), target).backward()
+        ...         optimizer.step()
+        >>> optimizer = NNAdam(model.parameters(), u_func=M_ABS())
+        >>> hogwild(train, model, optimizer, 8, args=(loader, ))
+
+    Set ``torch.set_num_threads`` in ``fn`` so that the processes do not
+    oversubscribe the cores. Flat groups move their parameters into new
+    storage inside every process and are not supported.
+
+    .. _Hogwild!: https://arxiv.org/abs/1106.5730
+    """
+    if any(group.get('flat', False) for group in optimizer.param_groups):
+        raise ValueError("hogwild does not support flat parameter groups")
+    optimizer.share_memory()
+    model.share_memory()
+    mp.spawn(fn, args=(model, optimizer) + tuple(args), nprocs=num_processes)
@@ -1,10 +1,9 @@
-import math
+from ..adaptive import AdaptiveOptimizer
+from ..functional import adam
+from ..updates import saturate
 
-import torch as T
-from torch.optim.optimizer import Optimizer
 
-
-class HAdam(Optimizer):
+class HAdam(AdaptiveOptimizer):
     r"""Implements Adam algorithm.
 
     It has been proposed in `Adam: A Method for Stochastic Optimization`_.
@@ -21,12 +20,47 @@ class HAdam(Optimizer):
         amsgrad (boolean, optional): whether to use the AMSGrad variant of this
             algorithm from the paper `On the Convergence of Adam and Beyond`_
             (default: False)
+        flat (boolean, optional): whether to pack the parameters of each group
+            and their state into contiguous 1-D tensors, so that a step
+            updates the whole group at once (default: False)
+        workspace (boolean, optional): whether to compute the update in scratch
+            tensors that are reused across parameters and steps instead of
+            allocating temporaries (default: False)
+        compiled (boolean, optional): whether to run the update of each
+            parameter as one kernel compiled with ``torch.compile``. Falls back
+            to eager mode where compiling is not possible (default: False)
+        accumulation_steps (int, optional): number of micro-batches whose
+            gradients are averaged into one update. ``step`` is called after
+            every micro-batch and only updates the parameters on the last
+            one of each window. ``state_dict`` can only be called between
+            windows (default: 1)
+        foreach (bool, optional): whether to update all the parameters of a
+            group at once with the ``torch._foreach_*`` kernels. Groups with
+            sparse gradients, and ``compiled`` groups, are updated one
+            parameter at a time (default: False)
+        capturable (bool, optional): whether to keep the steps, the learning
+            rates and ``g`` as 0-d tensors on the device of the parameters
+            and update each parameter with the kernel of its rule, so that
+            no value of the step is read on the host. Combined with
+            ``compiled`` the step is traced once (default: False)
+        num_threads (int, optional): number of threads that update the
+            parameters of a group, split into chunks with about the same
+            number of elements. Helps on CPUs with many cores, where the
+            update of a single parameter is too small to keep them busy.
+            Gives the same results as one thread, up to the random draws of
+            stochastic rounding (default: 1)
 
     .. _Adam\: A Method for Stochastic Optimization:
         https://arxiv.org/abs/1412.6980
     .. _On the Convergence of Adam and Beyond:
         https://openreview.net/forum?id=ryQu7f-RZ
     """
+    # State buffers of HAdam and whether they can be negative
+    STATE = dict(exp_avg=True, exp_avg_sq=False, max_exp_avg_sq=False)
+    HYPERPARAMETERS = ('lr_in', 'lr_out', 'lr', 'g')
+    OPTIONS = dict(AdaptiveOptimizer.OPTIONS,
+                   amsgrad=False)
+
     def __init__(self,
                  params,
                  u_func,
@@ -37,26 +71,21 @@ class HAdam(Optimizer):
                  betas=(0.9, 0.999),
                  eps=1e-8,
                  weight_decay=0,
-                 amsgrad=False):
-        if not 0.0 <= lr:
-            raise ValueError("Invalid learning rate: {}".format(lr))
-        if not 0.0 <= lr_in:
-            raise ValueError("Invalid inner learning rate: {}".format(lr_in))
-        if not 0.0 <= lr_out:
-            raise ValueError("Invalid outer learning rate: {}".format(lr_out))
-        if g < 0.0 or g > 1.0:
-            raise ValueError("Invalid g value: {}".format(g))
-        if not 0.0 <= eps:
-            raise ValueError("Invalid epsilon value: {}".format(eps))
+                 amsgrad=False,
+                 flat=False,
+                 workspace=False,
+                 compiled=False,
+                 accumulation_steps=1,
+                 foreach=False,
+                 capturable=False,
+                 num_threads=1):
         if not 0.0 <= betas[0] < 1.0:
             raise ValueError("Invalid beta parameter at index 0: {}".format(
                 betas[0]))
         if not 0.0 <= betas[1] < 1.0:
             raise ValueError("Invalid beta parameter at index 1: {}".format(
                 betas[1]))
-        if not 0.0 <= weight_decay:
-            raise ValueError(
-                "Invalid weight_decay value: {}".format(weight_decay))
+
         defaults = dict(u_func=u_func,
                         lr_in=lr_in,
                         lr_out=lr_out,
@@ -65,88 +94,42 @@ class HAdam(Optimizer):
                         betas=betas,
                         eps=eps,
                         weight_decay=weight_decay,
-                        amsgrad=amsgrad)
+                        amsgrad=amsgrad,
+                        flat=flat,
+                        workspace=workspace,
+                        compiled=compiled,
+                        accumulation_steps=accumulation_steps,
+                        foreach=foreach,
+                        capturable=capturable,
+                        num_threads=num_threads)
         super(HAdam, self).__init__(params, defaults)
 
-    def __setstate__(self, state):
-        super(HAdam, self).__setstate__(state)
-        for group in self.param_groups:
-            group.setdefault('amsgrad', False)
-
-    @T.no_grad()
-    def step(self, closure=None):
-        """Performs a single optimization step.
-
-        Arguments:
-            closure (callable, optional): A closure that reevaluates the model
-                and returns the loss.
-        """
-        loss = None
-        if closure is not None:
-            with T.enable_grad():
-                loss = closure()
-
-        for group in self.param_groups:
-            for p in group['params']:
-                if p.grad is None:
-                    continue
-                grad = p.grad
-                if grad.is_sparse:
-                    raise RuntimeError(
-                        'Adam does not support sparse gradients, please consider SparseAdam instead'
-                    )
-                amsgrad = group['amsgrad']
-
-                state = self.state[p]
-
-                # State initialization
-                if len(state) == 0:
-                    state['step'] = 0
-                    # Exponential moving average of gradient values
-                    state['exp_avg'] = T.zeros_like(
-                        p, memory_format=T.preserve_format)
-                    # Exponential moving average of squared gradient values
-                    state['exp_avg_sq'] = T.zeros_like(
-                        p, memory_format=T.preserve_format)
-                    if amsgrad:
-                        # Maintains max of all exp. moving avg. of sq. grad. values
-                        state['max_exp_avg_sq'] = T.zeros_like(
-                            p, memory_format=T.preserve_format)
-
-                exp_avg, exp_avg_sq = state['exp_avg'], state['exp_avg_sq']
-                if amsgrad:
-                    max_exp_avg_sq = state['max_exp_avg_sq']
-                beta1, beta2 = group['betas']
-
-                state['step'] += 1
-                bias_correction1 = 1 - beta1**state['step']
-                bias_correction2 = 1 - beta2**state['step']
-
-                if group['weight_decay'] != 0:
-                    grad = grad.add(p, alpha=group['weight_decay'])
-
-                # Decay the first and second moment running average coefficient
-                exp_avg.mul_(beta1).add_(grad, alpha=1 - beta1)
-                exp_avg_sq.mul_(beta2).addcmul_(grad, grad, value=1 - beta2)
-                if amsgrad:
-                    # Maintains the maximum of all 2nd moment running avg. till now
-                    T.max(max_exp_avg_sq, exp_avg_sq, out=max_exp_avg_sq)
-                    # Use the max. for normalizing running avg. of gradient
-                    denom = (max_exp_avg_sq.sqrt() /
-                             math.sqrt(bias_correction2)).add_(group['eps'])
-                else:
-                    denom = (exp_avg_sq.sqrt() /
-                             math.sqrt(bias_correction2)).add_(group['eps'])
-
-                step_size_out = group['lr_out'] / bias_correction1
-                step_size = group['lr'] / bias_correction1
-
-                group['u_func'](p,
-                                T.div(exp_avg, denom),
-                                lr_in=group['lr_in'],
-                                lr_out=step_size_out,
-                                lr=step_size,
-                                g=group['g'])
-                # p.addcdiv_(exp_avg, denom, value=-step_size)
-
-        return loss
+    def state_keys(self, group):
+        # Exponential moving averages of the gradient and its square, and
+        # with amsgrad the maximum of the latter
+        keys = ['exp_avg', 'exp_avg_sq']
+        if group['amsgrad']:
+            keys.append('max_exp_avg_sq')
+        return keys
+
+    def update(self, group, hyper, params, grads, buffers, state_steps):
+        # At a saturated g only one branch of H_ABS is computed
+        u_func, lr = saturate(group['u_func'], hyper['g'], hyper['lr'])
+        beta1, beta2 = group['betas']
+        adam(params,
+             grads,
+             buffers['exp_avg'],
+             buffers['exp_avg_sq'],
+             buffers['max_exp_avg_sq'],
+             state_steps,
+             u_func,
+             group['amsgrad'],
+             beta1,
+             beta2,
+             hyper['lr_in'],
+             hyper['lr_out'],
+             hyper['g'],
+             group['weight_decay'],
+             group['eps'],
+             lr=lr,
+             **self.options(group))
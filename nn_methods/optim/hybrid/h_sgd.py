@@ -1,6 +1,14 @@
 import torch as T
 from torch.optim.optimizer import Optimizer, required
 
+from ..accumulation import Accumulator
+from ..functional import sgd
+from ..groups import check_packed
+from ..hogwild import (momentum_buffer, preallocate_momentum_buffer_,
+                       share_memory_, store_momentum_buffer_)
+from ..updates import saturate
+from ..workspace import Workspace
+
 
 class HMSGD(Optimizer):
     r"""Implements stochastic gradient descent (optionally with momentum).
@@ -16,6 +24,23 @@ class HMSGD(Optimizer):
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
         dampening (float, optional): dampening for momentum (default: 0)
         nesterov (bool, optional): enables Nesterov momentum (default: False)
+        foreach (bool, optional): whether to update all the parameters of a
+            group at once with the ``torch._foreach_*`` kernels. Gives the
+            same results as the per-parameter loop (default: False)
+        workspace (bool, optional): whether to compute the update in scratch
+            tensors that are reused across parameters and steps instead of
+            allocating temporaries. Not used with ``foreach`` (default: False)
+        accumulation_steps (int, optional): number of micro-batches whose
+            gradients are averaged into one update. ``step`` is called after
+            every micro-batch and only updates the parameters on the last
+            one of each window. ``state_dict`` can only be called between
+            windows (default: 1)
+        num_threads (int, optional): number of threads that update the
+            parameters of a group, split into chunks with about the same
+            number of elements. Helps on CPUs with many cores, where the
+            update of a single parameter is too small to keep them busy.
+            Gives the same results as one thread, up to the random draws of
+            stochastic rounding (default: 1)
 
     Example:
         >>> optimizer = torch.optim.SGD(model.parameters(), lr=0.1, momentum=0.9)
@@ -62,7 +87,11 @@ class HMSGD(Optimizer):
                  momentum=0,
                  dampening=0,
                  weight_decay=0,
-                 nesterov=False):
+                 nesterov=False,
+                 foreach=False,
+                 workspace=False,
+                 accumulation_steps=1,
+                 num_threads=1):
         if lr is not required and lr < 0.0:
             raise ValueError("Invalid learning rate (normal): {}".format(lr))
         if lr_in is not required and lr_in < 0.0:
@@ -83,6 +112,12 @@ class HMSGD(Optimizer):
                 "Invalid weight_decay value: {}".format(weight_decay))
         if g > 1.0 or g < 0.0:
             raise ValueError("Invalid g value: {}".format(g))
+        if accumulation_steps < 1:
+            raise ValueError("Invalid accumulation_steps value: {}".format(
+                accumulation_steps))
+        if num_threads < 1:
+            raise ValueError(
+                "Invalid num_threads value: {}".format(num_threads))
 
         defaults = dict(u_func=u_func,
                         lr_in=lr_in,
@@ -93,17 +128,51 @@ class HMSGD(Optimizer):
                         momentum=momentum,
                         dampening=dampening,
                         weight_decay=weight_decay,
-                        nesterov=nesterov)
+                        nesterov=nesterov,
+                        foreach=foreach,
+                        workspace=workspace,
+                        accumulation_steps=accumulation_steps,
+                        num_threads=num_threads)
         if nesterov and (momentum <= 0 or dampening != 0):
             raise ValueError(
                 "Nesterov momentum requires a momentum and zero dampening")
 
         super().__init__(params, defaults)
+        self.workspace = Workspace()
+        self.accumulator = Accumulator()
 
     def __setstate__(self, state):
         super().__setstate__(state)
+        self.workspace = Workspace()
+        self.accumulator = Accumulator()
         for group in self.param_groups:
             group.setdefault('nesterov', False)
+            group.setdefault('foreach', False)
+            group.setdefault('workspace', False)
+            group.setdefault('accumulation_steps', 1)
+            group.setdefault('num_threads', 1)
+
+    def state_dict(self):
+        self.accumulator.check_boundary()
+        return super().state_dict()
+
+    def load_state_dict(self, state_dict):
+        super().load_state_dict(state_dict)
+        # The loaded state starts a new accumulation window
+        self.accumulator.clear()
+
+    def init_state(self, p, group):
+        state = self.state[p]
+        if group['momentum'] != 0:
+            preallocate_momentum_buffer_(state, p)
+
+    def share_memory(self):
+        """Allocates the state of every parameter in shared memory."""
+        share_memory_(self)
+
+    def add_param_group(self, param_group):
+        super().add_param_group(param_group)
+        check_packed(self.param_groups[-1])
 
     @T.no_grad()
     def step(self, closure=None):
@@ -118,75 +187,51 @@ class HMSGD(Optimizer):
             with T.enable_grad():
                 loss = closure()
 
-        for group in self.param_groups:
-            weight_decay = group['weight_decay']
-            momentum = group['momentum']
-            dampening = group['dampening']
-            nesterov = group['nesterov']
+        for i, group in enumerate(self.param_groups):
+            if not self.accumulator(i, group):
+                continue
+
+            params_with_grad = []
+            d_p_list = []
+            momentum_buffer_list = []
 
             for p in group['params']:
-                if p.grad is None:
-                    continue
-                d_p = p.grad
-                if weight_decay != 0:
-                    d_p = d_p.add(p, alpha=weight_decay)
-                if momentum != 0 and group['momentum_type'] == 'tanh':
-                    # TODO: This doesn't work
-                    self.update_tanh_momentum(p, d_p, group, momentum,
-                                              dampening, nesterov)
-                elif momentum != 0:
-                    self.update_normal_momentum(
-                        p,
-                        d_p,
-                        group,
-                        momentum,
-                        dampening,
-                        nesterov,
-                        group['g'],
-                    )
-                else:
-                    group['u_func'](p,
-                                    d_p,
-                                    lr_in=group['lr_in'],
-                                    lr_out=group['lr_out'],
-                                    lr=group['lr'],
-                                    g=group['g'])
-                    # -> p.add_(d_p, alpha=-group['lr'])
+                if p.grad is not None:
+                    params_with_grad.append(p)
+                    d_p_list.append(p.grad)
+                    state = self.state[p]
+                    momentum_buffer_list.append(momentum_buffer(state))
+
+            kwargs = dict(lr_in=group['lr_in'],
+                          lr_out=group['lr_out'],
+                          lr=group['lr'],
+                          g=group['g'])
+            u_func = group['u_func']
+            if group['momentum_type'] is None:
+                # At a saturated g only one branch of H_ABS is computed
+                u_func, kwargs['lr'] = saturate(u_func, group['g'],
+                                                group['lr'])
+                if kwargs['lr'] is None:
+                    del kwargs['lr']
+
+            sgd(params_with_grad,
+                d_p_list,
+                momentum_buffer_list,
+                u_func,
+                group['weight_decay'],
+                group['momentum'],
+                group['dampening'],
+                group['nesterov'],
+                momentum_type=group['momentum_type'],
+                nesterov_first_step=False,
+                foreach=group['foreach'],
+                workspace=self.workspace if group['workspace'] else None,
+                num_threads=group['num_threads'],
+                **kwargs)
+
+            # Keep the buffers created by this step
+            for p, buf in zip(params_with_grad, momentum_buffer_list):
+                if buf is not None:
+                    store_momentum_buffer_(self.state[p], buf)
 
         return loss
-
-    def update_normal_momentum(self, p, d_p, group, momentum, dampening,
-                               nesterov, g):
-        param_state = self.state[p]
-        if 'momentum_buffer' not in param_state:
-            buf = param_state['momentum_buffer'] = T.clone(d_p).detach()
-        else:
-            buf = param_state['momentum_buffer']
-            buf.mul_(momentum).add_(d_p, alpha=1 - dampening)
-            if nesterov:
-                d_p = d_p.add(buf, alpha=momentum)
-            else:
-                d_p = buf
-
-        group['u_func'](p,
-                        d_p,
-                        lr_in=group['lr_in'],
-                        lr_out=group['lr_out'],
-                        lr=group['lr'],
-                        g=g)
-
-    def update_tanh_momentum(self, p, d_p, group, momentum, dampening,
-                             nesterov):
-        param_state = self.state[p]
-        if 'momentum_buffer' not in param_state:
-            buf = param_state['momentum_buffer'] = T.clone(d_p).detach()
-        else:
-            buf = param_state['momentum_buffer']
-            buf.mul_(momentum).add_(group['u_func'].tanh_part(
-                d_p, group['lr_in']),
-                                    alpha=1 - dampening)
-            if nesterov:  # TODO: Apply momentum also in nesterov
-                d_p = d_p.add(buf, alpha=momentum)
-            else:
-                d_p = buf
-            group['u_func'].update(p, d_p, lr_out=group['lr_out'])
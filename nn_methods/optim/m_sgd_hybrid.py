@@ -1,191 +1,2 @@
-import torch as T
-from torch.optim.optimizer import Optimizer, required
-
-
-class HMSGD(Optimizer):
-    r"""Implements stochastic gradient descent (optionally with momentum).
-
-    Nesterov momentum is based on the formula from
-    `On the importance of initialization and momentum in deep learning`__.
-
-    Args:
-        params (iterable): iterable of parameters to optimize or dicts defining
-            parameter groups
-        lr (float): learning rate
-        momentum (float, optional): momentum factor (default: 0)
-        weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
-        dampening (float, optional): dampening for momentum (default: 0)
-        nesterov (bool, optional): enables Nesterov momentum (default: False)
-
-    Example:
-        >>> optimizer = torch.optim.SGD(model.parameters(), lr=0.1, momentum=0.9)
-        >>> optimizer.zero_grad()
-        >>> loss_fn(model(input), target).backward()
-        >>> optimizer.step()
-
-    __ http://www.cs.toronto.edu/%7Ehinton/absps/momentum.pdf
-
-    .. note::
-        The implementation of SGD with Momentum/Nesterov subtly differs from
-        Sutskever et. al. and implementations in some other frameworks.
-
-        Considering the specific case of Momentum, the update can be written as
-
-        .. math::
-            \begin{aligned}
-                v_{t+1} & = \mu * v_{t} + g_{t+1}, \\
-                p_{t+1} & = p_{t} - \text{lr} * v_{t+1},
-            \end{aligned}
-
-        where :math:`p`, :math:`g`, :math:`v` and :math:`\mu` denote the 
-        parameters, gradient, velocity, and momentum respectively.
-
-        This is in contrast to Sutskever et. al. and
-        other frameworks which employ an update of the form
-
-        .. math::
-            \begin{aligned}
-                v_{t+1} & = \mu * v_{t} + \text{lr} * g_{t+1}, \\
-                p_{t+1} & = p_{t} - v_{t+1}.
-            \end{aligned}
-
-        The Nesterov version is analogously modified.
-    """
-    def __init__(self,
-                 params,
-                 u_func,
-                 lr_in=required,
-                 lr_out=required,
-                 lr=required,
-                 g=1.0,
-                 momentum_type=None,
-                 momentum=0,
-                 dampening=0,
-                 weight_decay=0,
-                 nesterov=False):
-        if lr is not required and lr < 0.0:
-            raise ValueError("Invalid learning rate (normal): {}".format(lr))
-        if lr_in is not required and lr_in < 0.0:
-            raise ValueError("Invalid learning rate inside: {}".format(lr_in))
-        if lr_out is not required and lr_out < 0.0:
-            raise ValueError(
-                "Invalid learning rate outside: {}".format(lr_out))
-        if g < 0.0 or g > 1.0:
-            raise ValueError("Invalid g value: {}".format(g))
-
-        if momentum_type is not None and momentum_type != 'tanh':
-            raise ValueError("Invalid momentum type: {}".format(momentum_type))
-
-        if momentum < 0.0:
-            raise ValueError("Invalid momentum value: {}".format(momentum))
-        if weight_decay < 0.0:
-            raise ValueError(
-                "Invalid weight_decay value: {}".format(weight_decay))
-        if g > 1.0 or g < 0.0:
-            raise ValueError("Invalid g value: {}".format(g))
-
-        defaults = dict(u_func=u_func,
-                        lr_in=lr_in,
-                        lr_out=lr_out,
-                        lr=lr,
-                        g=g,
-                        momentum_type=momentum_type,
-                        momentum=momentum,
-                        dampening=dampening,
-                        weight_decay=weight_decay,
-                        nesterov=nesterov)
-        if nesterov and (momentum <= 0 or dampening != 0):
-            raise ValueError(
-                "Nesterov momentum requires a momentum and zero dampening")
-
-        super().__init__(params, defaults)
-
-    def __setstate__(self, state):
-        super().__setstate__(state)
-        for group in self.param_groups:
-            group.setdefault('nesterov', False)
-
-    @T.no_grad()
-    def step(self, closure=None):
-        """Performs a single optimization step.
-
-        Arguments:
-            closure (callable, optional): A closure that reevaluates the model
-                and returns the loss.
-        """
-        loss = None
-        if closure is not None:
-            with T.enable_grad():
-                loss = closure()
-
-        for group in self.param_groups:
-            weight_decay = group['weight_decay']
-            momentum = group['momentum']
-            dampening = group['dampening']
-            nesterov = group['nesterov']
-
-            for p in group['params']:
-                if p.grad is None:
-                    continue
-                d_p = p.grad
-                if weight_decay != 0:
-                    d_p = d_p.add(p, alpha=weight_decay)
-                if momentum != 0 and group['momentum_type'] == 'tanh':
-                    # TODO: This doesn't work
-                    self.update_tanh_momentum(p, d_p, group, momentum,
-                                              dampening, nesterov)
-                elif momentum != 0:
-                    self.update_normal_momentum(
-                        p,
-                        d_p,
-                        group,
-                        momentum,
-                        dampening,
-                        nesterov,
-                        group['g'],
-                    )
-                else:
-                    group['u_func'](p,
-                                    d_p,
-                                    lr_in=group['lr_in'],
-                                    lr_out=group['lr_out'],
-                                    lr=group['lr'],
-                                    g=group['g'])
-                    # -> p.add_(d_p, alpha=-group['lr'])
-
-        return loss
-
-    def update_normal_momentum(self, p, d_p, group, momentum, dampening,
-                               nesterov, g):
-        param_state = self.state[p]
-        if 'momentum_buffer' not in param_state:
-            buf = param_state['momentum_buffer'] = T.clone(d_p).detach()
-        else:
-            buf = param_state['momentum_buffer']
-            buf.mul_(momentum).add_(d_p, alpha=1 - dampening)
-            if nesterov:
-                d_p = d_p.add(buf, alpha=momentum)
-            else:
-                d_p = buf
-
-        group['u_func'](p,
-                        d_p,
-                        lr_in=group['lr_in'],
-                        lr_out=group['lr_out'],
-                        g=g)
-
-    def update_tanh_momentum(self, p, d_p, group, momentum, dampening,
-                             nesterov):
-        param_state = self.state[p]
-        if 'momentum_buffer' not in param_state:
-            buf = param_state['momentum_buffer'] = T.clone(d_p).detach()
-        else:
-            buf = param_state['momentum_buffer']
-            buf.mul_(momentum).add_(group['u_func'].tanh_part(
-                d_p, group['lr_in']),
-                                    alpha=1 - dampening)
-            if nesterov:  # TODO: Apply momentum also in nesterov
-                d_p = d_p.add(buf, alpha=momentum)
-            else:
-                d_p = buf
-            group['u_func'].update(p, d_p, lr_out=group['lr_out'])
+# HMSGD lives in the hybrid package, kept importable from here
+from .hybrid.h_sgd import HMSGD  # noqa: F401
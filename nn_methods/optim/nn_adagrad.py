@@ -1,13 +1,10 @@
-import math
-from typing import List
-
 import torch
-from torch import Tensor
-from torch.optim._functional import _make_sparse
-from torch.optim.optimizer import Optimizer
+
+from .adaptive import AdaptiveOptimizer
+from .functional import adagrad
 
 
-class MAdagrad(Optimizer):
+class MAdagrad(AdaptiveOptimizer):
     """Implements Adagrad algorithm.
 
     It has been proposed in `Adaptive Subgradient Methods for Online Learning
@@ -21,10 +18,48 @@ class MAdagrad(Optimizer):
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
         eps (float, optional): term added to the denominator to improve
             numerical stability (default: 1e-10)
+        flat (bool, optional): whether to pack the parameters of each group
+            and their state into contiguous 1-D tensors, so that a step
+            updates the whole group at once (default: False)
+        workspace (bool, optional): whether to compute the update in scratch
+            tensors that are reused across parameters and steps instead of
+            allocating temporaries (default: False)
+        compiled (bool, optional): whether to run the update of each
+            parameter as one kernel compiled with ``torch.compile``. Falls back
+            to eager mode where compiling is not possible (default: False)
+        quantize_state (bool, optional): whether to store the state of
+            parameters with at least 4096 elements in 8-bit block-wise
+            quantized form. It is dequantized one parameter at a time inside
+            the step. Cannot be used with ``flat`` (default: False)
+        accumulation_steps (int, optional): number of micro-batches whose
+            gradients are averaged into one update. ``step`` is called after
+            every micro-batch and only updates the parameters on the last
+            one of each window. ``state_dict`` can only be called between
+            windows (default: 1)
+        foreach (bool, optional): whether to update all the parameters of a
+            group at once with the ``torch._foreach_*`` kernels. Groups with
+            sparse gradients, and ``compiled`` groups, are updated one
+            parameter at a time (default: False)
+        capturable (bool, optional): whether to keep the steps, the learning
+            rates and ``g`` as 0-d tensors on the device of the parameters
+            and update each parameter with the kernel of its rule, so that
+            no value of the step is read on the host. Combined with
+            ``compiled`` the step is traced once (default: False)
+        num_threads (int, optional): number of threads that update the
+            parameters of a group, split into chunks with about the same
+            number of elements. Helps on CPUs with many cores, where the
+            update of a single parameter is too small to keep them busy.
+            Gives the same results as one thread, up to the random draws of
+            stochastic rounding (default: 1)
 
     .. _Adaptive Subgradient Methods for Online Learning and Stochastic
         Optimization: http://jmlr.org/papers/v12/duchi11a.html
     """
+    # State buffers of MAdagrad and whether they can be negative
+    STATE = dict(sum=False)
+    OPTIONS = dict(AdaptiveOptimizer.OPTIONS,
+                   quantize_state=False)
+
     def __init__(self,
                  params,
                  u_func,
@@ -34,24 +69,21 @@ class MAdagrad(Optimizer):
                  lr_decay=0,
                  weight_decay=0,
                  initial_accumulator_value=0,
-                 eps=1e-10):
-        if not 0.0 <= lr_in:
-            raise ValueError("Invalid inner learning rate: {}".format(lr_in))
-        if not 0.0 <= lr_out:
-            raise ValueError("Invalid outter learning rate: {}".format(lr_out))
-        if g < 0.0 or g > 1.0:
-            raise ValueError("Invalid g value: {}".format(g))
+                 eps=1e-10,
+                 flat=False,
+                 workspace=False,
+                 compiled=False,
+                 quantize_state=False,
+                 accumulation_steps=1,
+                 foreach=False,
+                 capturable=False,
+                 num_threads=1):
         if not 0.0 <= lr_decay:
             raise ValueError("Invalid lr_decay value: {}".format(lr_decay))
-        if not 0.0 <= weight_decay:
-            raise ValueError(
-                "Invalid weight_decay value: {}".format(weight_decay))
         if not 0.0 <= initial_accumulator_value:
             raise ValueError(
                 "Invalid initial_accumulator_value value: {}".format(
                     initial_accumulator_value))
-        if not 0.0 <= eps:
-            raise ValueError("Invalid epsilon value: {}".format(eps))
 
         defaults = dict(u_func=u_func,
                         lr_in=lr_in,
@@ -60,116 +92,42 @@ class MAdagrad(Optimizer):
                         lr_decay=lr_decay,
                         eps=eps,
                         weight_decay=weight_decay,
-                        initial_accumulator_value=initial_accumulator_value)
+                        initial_accumulator_value=initial_accumulator_value,
+                        flat=flat,
+                        workspace=workspace,
+                        compiled=compiled,
+                        quantize_state=quantize_state,
+                        accumulation_steps=accumulation_steps,
+                        foreach=foreach,
+                        capturable=capturable,
+                        num_threads=num_threads)
         super().__init__(params, defaults)
 
         for group in self.param_groups:
             for p in group['params']:
-                state = self.state[p]
-                state['step'] = 0
-                state['sum'] = torch.full_like(
-                    p,
-                    initial_accumulator_value,
-                    memory_format=torch.preserve_format)
-
-    def share_memory(self):
-        for group in self.param_groups:
-            for p in group['params']:
-                state = self.state[p]
-                state['sum'].share_memory_()
-
-    @torch.no_grad()
-    def step(self, closure=None):
-        """Performs a single optimization step.
-
-        Arguments:
-            closure (callable, optional): A closure that reevaluates the model
-                and returns the loss.
-        """
-        loss = None
-        if closure is not None:
-            with torch.enable_grad():
-                loss = closure()
-
-        for group in self.param_groups:
-            params_with_grad = []
-            grads = []
-            state_sums = []
-            state_steps = []
-
-            for p in group['params']:
-                if p.grad is not None:
-                    params_with_grad.append(p)
-                    grads.append(p.grad)
-                    state = self.state[p]
-                    state_sums.append(state['sum'])
-                    # update the steps for each param group update
-                    state['step'] += 1
-                    # record the step after step update
-                    state_steps.append(state['step'])
-
-            adagrad(params_with_grad, grads, state_sums, state_steps,
-                    group['u_func'], group['lr_in'], group['lr_out'],
-                    group['g'], group['weight_decay'], group['lr_decay'],
-                    group['eps'])
-
-        return loss
-
-
-def adagrad(
-    params: List[Tensor],
-    grads: List[Tensor],
-    state_sums: List[Tensor],
-    state_steps: List[int],
-    u_func,
-    lr_in: float,
-    lr_out: float,
-    g: float,
-    weight_decay: float,
-    lr_decay: float,
-    eps: float,
-):
-    r"""Functional API that performs Adagrad algorithm computation.
-
-    See :class:`~torch.optim.Adagrad` for details.
-    """
-
-    for (param, grad, state_sum, step) in zip(params, grads, state_sums,
-                                              state_steps):
-        if weight_decay != 0:
-            if grad.is_sparse:
-                raise RuntimeError(
-                    "weight_decay option is not compatible with sparse gradients"
-                )
-            grad = grad.add(param, alpha=weight_decay)
-
-        clr = lr_out / (1 + (step - 1) * lr_decay)
-
-        if grad.is_sparse:
-            grad = grad.coalesce(
-            )  # the update is non-linear so indices must be unique
-            grad_indices = grad._indices()
-            grad_values = grad._values()
-            size = grad.size()
-
-            state_sum.add_(_make_sparse(grad, grad_indices,
-                                        grad_values.pow(2)))
-            std = state_sum.sparse_mask(grad)
-            std_values = std._values().sqrt_().add_(eps)
-            sparse_grad = _make_sparse(grad, grad_indices,
-                                       grad_values / std_values)
-            param.add_(sparse_grad, lr_out=lr_out, lr_in=lr_in, g=g)
-
-            # -> param.add_(_make_sparse(grad, grad_indices,
-            #                         grad_values / std_values),
-            #                         alpha=-clr)
-        else:
-            state_sum.addcmul_(grad, grad, value=1)
-            std = state_sum.sqrt().add_(eps)
-            u_func(param,
-                   torch.div(grad, std),
-                   lr_in=lr_in,
-                   lr_out=lr_out,
-                   g=g)
-
-            # -> param.addcdiv_(grad, std, value=-clr)
+                self.init_state(p, group)
+        for i, group in enumerate(self.param_groups):
+            if group['flat']:
+                self.flat_groups[i] = self.flatten_group(group)
+
+    def state_keys(self, group):
+        return ['sum']
+
+    def initial_state(self, p, group, key):
+        return torch.full_like(p,
+                               group['initial_accumulator_value'],
+                               memory_format=torch.preserve_format)
+
+    def update(self, group, hyper, params, grads, buffers, state_steps):
+        adagrad(params,
+                grads,
+                buffers['sum'],
+                state_steps,
+                group['u_func'],
+                hyper['lr_in'],
+                hyper['lr_out'],
+                hyper['g'],
+                group['weight_decay'],
+                group['lr_decay'],
+                group['eps'],
+                **self.options(group))
@@ -1,8 +1,8 @@
-import torch as T
-from torch.optim.optimizer import Optimizer
+from .adaptive import AdaptiveOptimizer
+from .functional import rmsprop
 
 
-class NNRMSprop(Optimizer):
+class NNRMSprop(AdaptiveOptimizer):
     r"""Implements RMSprop algorithm.
 
     Proposed by G. Hinton in his
@@ -28,8 +28,53 @@ class NNRMSprop(Optimizer):
         centered (bool, optional) : if ``True``, compute the centered RMSProp,
             the gradient is normalized by an estimation of its variance
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
+        flat (bool, optional): whether to pack the parameters of each group
+            and their state into contiguous 1-D tensors, so that a step
+            updates the whole group at once (default: False)
+        workspace (bool, optional): whether to compute the update in scratch
+            tensors that are reused across parameters and steps instead of
+            allocating temporaries (default: False)
+        compiled (bool, optional): whether to run the update of each
+            parameter as one kernel compiled with ``torch.compile``. Falls back
+            to eager mode where compiling is not possible (default: False)
+        stochastic_rounding (bool, optional): whether to apply the update to
+            bfloat16 parameters in float32 and write it back with stochastic
+            rounding, which keeps updates smaller than the bfloat16 precision
+            (default: False)
+        quantize_state (bool, optional): whether to store the state of
+            parameters with at least 4096 elements in 8-bit block-wise
+            quantized form. It is dequantized one parameter at a time inside
+            the step. Cannot be used with ``flat`` (default: False)
+        accumulation_steps (int, optional): number of micro-batches whose
+            gradients are averaged into one update. ``step`` is called after
+            every micro-batch and only updates the parameters on the last
+            one of each window. ``state_dict`` can only be called between
+            windows (default: 1)
+        foreach (bool, optional): whether to update all the parameters of a
+            group at once with the ``torch._foreach_*`` kernels. Groups with
+            sparse gradients, and ``compiled`` groups, are updated one
+            parameter at a time (default: False)
+        capturable (bool, optional): whether to keep the steps, the learning
+            rates and ``g`` as 0-d tensors on the device of the parameters
+            and update each parameter with the kernel of its rule, so that
+            no value of the step is read on the host. Combined with
+            ``compiled`` the step is traced once (default: False)
+        num_threads (int, optional): number of threads that update the
+            parameters of a group, split into chunks with about the same
+            number of elements. Helps on CPUs with many cores, where the
+            update of a single parameter is too small to keep them busy.
+            Gives the same results as one thread, up to the random draws of
+            stochastic rounding (default: 1)
 
     """
+    # State buffers of NNRMSprop and whether they can be negative
+    STATE = dict(square_avg=False, momentum_buffer=True, grad_avg=True)
+    OPTIONS = dict(AdaptiveOptimizer.OPTIONS,
+                   momentum=0,
+                   centered=False,
+                   stochastic_rounding=False,
+                   quantize_state=False)
+
     def __init__(self,
                  params,
                  u_func,
@@ -40,20 +85,18 @@ class NNRMSprop(Optimizer):
                  eps=1e-8,
                  weight_decay=0,
                  momentum=0,
-                 centered=False):
-        if not 0.0 <= lr_in:
-            raise ValueError("Invalid inner learning rate: {}".format(lr_in))
-        if not 0.0 <= lr_out:
-            raise ValueError("Invalid outer learning rate: {}".format(lr_out))
-        if g < 0.0 or g > 1.0:
-            raise ValueError("Invalid g value: {}".format(g))
-        if not 0.0 <= eps:
-            raise ValueError("Invalid epsilon value: {}".format(eps))
+                 centered=False,
+                 flat=False,
+                 workspace=False,
+                 compiled=False,
+                 stochastic_rounding=False,
+                 quantize_state=False,
+                 accumulation_steps=1,
+                 foreach=False,
+                 capturable=False,
+                 num_threads=1):
         if not 0.0 <= momentum:
             raise ValueError("Invalid momentum value: {}".format(momentum))
-        if not 0.0 <= weight_decay:
-            raise ValueError(
-                "Invalid weight_decay value: {}".format(weight_decay))
         if not 0.0 <= alpha:
             raise ValueError("Invalid alpha value: {}".format(alpha))
 
@@ -65,85 +108,39 @@ class NNRMSprop(Optimizer):
                         alpha=alpha,
                         eps=eps,
                         centered=centered,
-                        weight_decay=weight_decay)
+                        weight_decay=weight_decay,
+                        flat=flat,
+                        workspace=workspace,
+                        compiled=compiled,
+                        stochastic_rounding=stochastic_rounding,
+                        quantize_state=quantize_state,
+                        accumulation_steps=accumulation_steps,
+                        foreach=foreach,
+                        capturable=capturable,
+                        num_threads=num_threads)
         super(NNRMSprop, self).__init__(params, defaults)
 
-    def __setstate__(self, state):
-        super(NNRMSprop, self).__setstate__(state)
-        for group in self.param_groups:
-            group.setdefault('momentum', 0)
-            group.setdefault('centered', False)
-
-    @T.no_grad()
-    def step(self, closure=None):
-        """Performs a single optimization step.
-
-        Arguments:
-            closure (callable, optional): A closure that reevaluates the model
-                and returns the loss.
-        """
-        loss = None
-        if closure is not None:
-            with T.enable_grad():
-                loss = closure()
-
-        for group in self.param_groups:
-            for p in group['params']:
-                if p.grad is None:
-                    continue
-                grad = p.grad
-                if grad.is_sparse:
-                    raise RuntimeError(
-                        'RMSprop does not support sparse gradients')
-                state = self.state[p]
-
-                # State initialization
-                if len(state) == 0:
-                    state['step'] = 0
-                    state['square_avg'] = T.zeros_like(
-                        p, memory_format=T.preserve_format)
-                    if group['momentum'] > 0:
-                        state['momentum_buffer'] = T.zeros_like(
-                            p, memory_format=T.preserve_format)
-                    if group['centered']:
-                        state['grad_avg'] = T.zeros_like(
-                            p, memory_format=T.preserve_format)
-
-                square_avg = state['square_avg']
-                alpha = group['alpha']
-
-                state['step'] += 1
-
-                if group['weight_decay'] != 0:
-                    grad = grad.add(p, alpha=group['weight_decay'])
-
-                square_avg.mul_(alpha).addcmul_(grad, grad, value=1 - alpha)
-
-                if group['centered']:
-                    grad_avg = state['grad_avg']
-                    grad_avg.mul_(alpha).add_(grad, alpha=1 - alpha)
-                    avg = square_avg.addcmul(grad_avg, grad_avg,
-                                             value=-1).sqrt_().add_(
-                                                 group['eps'])
-                else:
-                    avg = square_avg.sqrt().add_(group['eps'])
-
-                if group['momentum'] > 0:
-                    buf = state['momentum_buffer']
-                    buf.mul_(group['momentum']).addcdiv_(grad, avg)
-                    group['u_func'](p,
-                                    buf,
-                                    lr_in=group['lr_in'],
-                                    lr_out=group['lr_out'],
-                                    g=group['group'])
-                    # -> p.add_(buf, alpha=-group['lr'])
-
-                else:
-                    group['u_func'](p,
-                                    T.div(grad, avg),
-                                    lr_in=group['lr_in'],
-                                    lr_out=group['lr_out'],
-                                    g=group['g'])
-                    # -> p.addcdiv_(grad, avg, value=-group['lr'])
-
-        return loss
+    def state_keys(self, group):
+        keys = ['square_avg']
+        if group['momentum'] > 0:
+            keys.append('momentum_buffer')
+        if group['centered']:
+            keys.append('grad_avg')
+        return keys
+
+    def update(self, group, hyper, params, grads, buffers, state_steps):
+        rmsprop(params,
+                grads,
+                buffers['square_avg'],
+                buffers['grad_avg'],
+                buffers['momentum_buffer'],
+                group['u_func'],
+                hyper['lr_in'],
+                hyper['lr_out'],
+                hyper['g'],
+                group['alpha'],
+                group['eps'],
+                group['weight_decay'],
+                group['momentum'],
+                group['centered'],
+                **self.options(group))
@@ -0,0 +1,50 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+def balanced_chunks(tensors, num_chunks):
+    """Splits the indices of ``tensors`` into chunks of similar total size.
+
+    Tensors are assigned largest first to the smallest chunk. The indices of
+    every chunk are kept in their original order.
+    """
+    chunks = [[] for _ in range(min(num_chunks, len(tensors)))]
+    sizes = [0] * len(chunks)
+    for i in sorted(range(len(tensors)), key=lambda i: -tensors[i].numel()):
+        c = sizes.index(min(sizes))
+        chunks[c].append(i)
+        sizes[c] += tensors[i].numel()
+    return [sorted(chunk) for chunk in chunks]
+
+
+@functools.lru_cache(maxsize=None)
+def thread_pool(num_threads):
+    """The pool of ``num_threads`` threads, created once per size."""
+    return ThreadPoolExecutor(num_threads, thread_name_prefix='nn_methods')
+
+
+def parallel_apply(fn, num_threads, lists, *args, **kwargs):
+    """Calls ``fn`` on balanced chunks of a group from ``num_threads`` threads.
+
+    ``lists`` are the per-parameter lists of the group, starting with the
+    parameters, and are followed by the other arguments of ``fn``. Lists of
+    another length, such as the unused state of a group, are passed whole.
+    Entries replaced by ``fn``, such as new momentum buffers, are written
+    back. The update of a parameter does not depend on the others and torch
+    releases the GIL inside its kernels, so the chunks run concurrently and
+    give the same results as one sequential call.
+    """
+    n = len(lists[0])
+    chunks = balanced_chunks(lists[0], num_threads)
+    chunk_lists = [[[l[i] for i in chunk] if len(l) == n else l
+                    for l in lists] for chunk in chunks]
+    pool = thread_pool(num_threads)
+    futures = [pool.submit(fn, *ls, *args, **kwargs) for ls in chunk_lists]
+    for future in futures:
+        future.result()
+
+    for chunk, ls in zip(chunks, chunk_lists):
+        for l, chunk_l in zip(lists, ls):
+            if len(l) == n:
+                for j, i in enumerate(chunk):
+                    l[i] = chunk_l[j]
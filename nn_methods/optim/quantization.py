@@ -0,0 +1,140 @@
+import math
+
+import torch as T
+import torch.nn.functional as F
+
+# Number of elements sharing one scale
+BLOCK_SIZE = 2048
+# Smaller tensors keep their state in full precision
+MIN_SIZE = 4096
+# The smallest nonzero magnitude of a code, relative to the absmax of its
+# block
+MIN_MAGNITUDE = 2**-16
+
+_code_maps = {}
+
+
+def code_map(levels, device):
+    """Returns the magnitudes that the codes ``0`` to ``levels`` stand for.
+
+    Code 0 is zero and the others are spaced geometrically from
+    ``MIN_MAGNITUDE`` to 1, so elements much smaller than the absmax of
+    their block keep a few percent of relative precision instead of
+    rounding to 0.
+    """
+    key = (levels, device)
+    if key not in _code_maps:
+        exponents = T.linspace(math.log2(MIN_MAGNITUDE),
+                               0,
+                               levels,
+                               dtype=T.float64,
+                               device=device)
+        _code_maps[key] = F.pad(T.exp2(exponents), (1, 0)).float()
+    return _code_maps[key]
+
+
+@T.no_grad()
+def quantize(t, signed, block_size=BLOCK_SIZE, stochastic=False):
+    """Quantizes ``t`` block-wise to 8 bits.
+
+    Returns the codes, padded to a whole number of blocks, and the absmax of
+    every block. Every element is divided by the absmax of its block and
+    mapped to a code of :func:`code_map`, carrying the sign for signed
+    tensors in int8. Non-negative tensors are quantized in square-root
+    domain into uint8, which spreads the codes over the large dynamic range
+    of squared gradients.
+
+    With ``stochastic``, an element is rounded to one of its two nearest
+    codes with a probability that makes the result exact in expectation.
+    The state buffers are requantized at every step this way, since the
+    change of a step is mostly smaller than the spacing of the codes and
+    would be lost by rounding to nearest.
+    """
+    x = t.detach().reshape(-1).float()
+    if not signed:
+        x = x.sqrt()
+    x = F.pad(x, (0, -x.numel() % block_size)).view(-1, block_size)
+    absmax = x.abs().amax(dim=1, keepdim=True)
+    absmax.clamp_min_(T.finfo(T.float32).tiny)
+    levels = 127 if signed else 255
+    table = code_map(levels, x.device)
+
+    magnitude = x.abs().div_(absmax).clamp_(max=1)
+    low = T.searchsorted(table, magnitude, right=True).sub_(1)
+    low.clamp_(max=levels - 1)
+    low_value = table[low]
+    fraction = (magnitude - low_value).div_(table[low + 1] - low_value)
+    if stochastic:
+        up = T.rand_like(fraction) < fraction
+    else:
+        up = fraction >= 0.5
+    codes = low.add_(up)
+    if signed:
+        codes.mul_(x.sign().long())
+    codes = codes.to(T.int8 if signed else T.uint8)
+    return codes.view(-1), absmax.view(-1)
+
+
+@T.no_grad()
+def dequantize(codes, absmax, signed, like):
+    """Reverses :func:`quantize` into a tensor shaped like ``like``."""
+    levels = 127 if signed else 255
+    table = code_map(levels, codes.device)
+    x = table[codes.long().abs()].view(absmax.numel(), -1)
+    if signed:
+        x.mul_(codes.sign().view_as(x))
+    x.mul_(absmax.view(-1, 1))
+    x = x.view(-1)[:like.numel()].view(like.shape)
+    if not signed:
+        x = x.square()
+    return x.to(like.dtype)
+
+
+def quantize_state_(state, keys):
+    """Replaces the buffers ``state[key]`` with their 8-bit codes.
+
+    ``keys`` maps every key to whether its buffer can be negative; keys
+    missing from ``state`` are skipped. The scales are stored next to the
+    codes as ``state[key + '_absmax']``.
+    """
+    for key, signed in keys.items():
+        if key in state:
+            state[key], state[key + '_absmax'] = quantize(state[key], signed)
+
+
+def dequantize_state(state, keys, p):
+    """Returns the state buffers of ``p``, dequantized where needed."""
+    buffers = {}
+    for key, signed in keys.items():
+        if key not in state:
+            continue
+        buffers[key] = state[key]
+        if key + '_absmax' in state:
+            buffers[key] = dequantize(state[key], state[key + '_absmax'],
+                                      signed, p)
+    return buffers
+
+
+def requantize_state_(state, keys, buffers):
+    """Writes the buffers returned by :func:`dequantize_state` back.
+
+    The codes are updated in place so that shared memory stays shared.
+    """
+    for key, value in buffers.items():
+        if key + '_absmax' not in state:
+            continue
+        codes, absmax = quantize(value, keys[key], stochastic=True)
+        state[key].copy_(codes)
+        state[key + '_absmax'].copy_(absmax)
+
+
+def restore_state_(state, keys):
+    """Restores the dtypes of the codes and scales in a loaded state.
+
+    ``Optimizer.load_state_dict`` casts every state tensor to the dtype of
+    its parameter, which turns the codes into floats.
+    """
+    for key, signed in keys.items():
+        if key + '_absmax' in state:
+            state[key] = state[key].to(T.int8 if signed else T.uint8)
+            state[key + '_absmax'] = state[key + '_absmax'].float()
@@ -15,17 +15,13 @@ class GExponentialScheduler():
         self.init_g = []
 
     def state_dict(self):
-        state_dict = {
+        return {
             key: value
-            for key, value in self.__dict__.items()
-            if key not in ('optimizer', 'lr_lambda')
+            for key, value in self.__dict__.items() if key != 'optimizer'
         }
-        state_dict['lr_lambda'] = self.lr_lambda
-
-        return state_dict
 
     def load_state_dict(self, state_dict):
-        pass
+        self.__dict__.update(state_dict)
 
     def step(self):
         if self.last_epoch == 0:
@@ -47,3 +43,139 @@ class GExponentialScheduler():
         else:
             for param_group in self.optimizer.param_groups:
                 param_group['g'] = 1.0
+
+
+class GSchedule(object):
+    """Per-iteration schedule of ``g`` for the hybrid optimizers.
+
+    The value of ``g`` at every iteration of the run is computed once, into a
+    tensor on the device of each parameter group. The ``g`` of every group is
+    replaced by a 0-d tensor that :meth:`step` refreshes in place from an
+    index kept on the same device, so an iteration costs one indexing kernel
+    per group, no Python arithmetic and no host synchronization. Compiled
+    and capturable steps read the same tensor every time.
+
+    With ``s`` going from 0 to 1 over ``total_steps``, starting from the
+    ``g`` of each group, the shapes are:
+
+    * ``'exponential'``: ``g_start * (g_end / g_start) ** s``
+    * ``'inverse'``: ``1 - (1 - g_start) * ((1 - g_end) / (1 - g_start)) ** s``
+    * ``'cosine'``: ``g_end + (g_start - g_end) * (1 + cos(pi * s)) / 2``
+    * ``'linear'``: ``g_start + (g_end - g_start) * s``
+
+    ``g`` is 1 during the first ``patient_steps`` iterations, as during the
+    ``patient_epoch`` of :class:`GExponentialScheduler`, and stays at
+    ``g_end`` once the schedule is over. The exponential shape needs every
+    ``g`` above 0 and the inverse shape every ``g`` below 1, so neither
+    starts from the default ``g = 1`` of the hybrid optimizers: use the
+    cosine or linear shape, or set ``g`` below 1.
+
+    Since ``g`` is a tensor, whose value is not read on the host, the
+    hybrid optimizers no longer drop the dead branch of :class:`H_ABS` at
+    ``g = 0`` or ``g = 1`` (see :func:`saturate`) for as long as the
+    schedule is attached. :meth:`step` points ``g`` back at the schedule if
+    it was replaced, e.g. by ``optimizer.load_state_dict``.
+
+    Arguments:
+        optimizer (Optimizer): a hybrid optimizer, e.g. :class:`HMSGD`,
+            :class:`HAdam`, :class:`HRMSprop` or :class:`HAdagrad`
+        total_steps (int): number of iterations from the start to ``g_end``
+        g_end (float): the final value of ``g``
+        shape (str, optional): one of ``'exponential'``, ``'inverse'``,
+            ``'cosine'`` and ``'linear'`` (default: 'exponential')
+        patient_steps (int, optional): number of iterations with ``g = 1``
+            before the schedule starts (default: 0)
+    """
+
+    shapes = ('exponential', 'inverse', 'cosine', 'linear')
+
+    def __init__(self,
+                 optimizer,
+                 total_steps,
+                 g_end,
+                 shape='exponential',
+                 patient_steps=0):
+        if total_steps < 1:
+            raise ValueError(
+                "Invalid total_steps value: {}".format(total_steps))
+        if shape not in self.shapes:
+            raise ValueError("Invalid shape: {}".format(shape))
+        if patient_steps < 0:
+            raise ValueError(
+                "Invalid patient_steps value: {}".format(patient_steps))
+        init_g = [float(group['g']) for group in optimizer.param_groups]
+        if shape == 'exponential' and min(init_g + [g_end]) <= 0:
+            raise ValueError(
+                "The exponential shape requires g values above 0, got g = {} "
+                "and g_end = {}".format(init_g, g_end))
+        if shape == 'inverse' and max(init_g + [g_end]) >= 1:
+            raise ValueError(
+                "The inverse shape requires g values below 1, got g = {} and "
+                "g_end = {}; set g of the optimizer below 1 or use the cosine "
+                "or linear shape".format(init_g, g_end))
+        self.optimizer = optimizer
+        self.total_steps = total_steps
+        self.g_end = g_end
+        self.shape = shape
+        self.patient_steps = patient_steps
+        self.init_g = init_g
+        self.last_step = 0
+        self.build()
+
+    def build(self):
+        """Computes the schedules and points ``g`` at their current values."""
+        self.schedules = []
+        self.indices = []
+        self.values = []
+        for group, g_start in zip(self.optimizer.param_groups, self.init_g):
+            device = group['params'][0].device
+            schedule = self.schedule(g_start, device)
+            last = min(self.last_step, len(schedule) - 1)
+            index = T.full((1, ), last, dtype=T.long, device=device)
+            group['g'] = schedule[index].view(())
+            self.schedules.append(schedule)
+            self.indices.append(index)
+            self.values.append(group['g'])
+
+    def schedule(self, g_start, device):
+        """Returns the values of ``g`` at every iteration."""
+        s = T.linspace(0,
+                       1,
+                       self.total_steps + 1,
+                       dtype=T.float64,
+                       device=device)
+        g_end = self.g_end
+        if self.shape == 'exponential':
+            g = g_start * (g_end / g_start)**s
+        elif self.shape == 'inverse':
+            g = 1 - (1 - g_start) * ((1 - g_end) / (1 - g_start))**s
+        elif self.shape == 'cosine':
+            g = g_end + (g_start - g_end) * (1 + T.cos(math.pi * s)) / 2
+        else:
+            g = g_start + (g_end - g_start) * s
+        patience = T.ones(self.patient_steps, dtype=T.float64, device=device)
+        return T.cat([patience, g]).float()
+
+    def step(self):
+        """Moves every group to the ``g`` of the next iteration."""
+        self.last_step += 1
+        for group, schedule, index, value in zip(self.optimizer.param_groups,
+                                                 self.schedules, self.indices,
+                                                 self.values):
+            index.add_(1).clamp_(max=len(schedule) - 1)
+            T.index_select(schedule, 0, index, out=value.view(1))
+            # Loading the state of the optimizer replaces g with the saved
+            # value, a float or a tensor on another device
+            if group['g'] is not value:
+                group['g'] = value
+
+    def state_dict(self):
+        return {
+            key: value
+            for key, value in self.__dict__.items()
+            if key not in ('optimizer', 'schedules', 'indices', 'values')
+        }
+
+    def load_state_dict(self, state_dict):
+        self.__dict__.update(state_dict)
+        self.build()
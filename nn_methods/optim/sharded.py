@@ -0,0 +1,187 @@
+import torch as T
+import torch.distributed as dist
+from torch.optim.optimizer import Optimizer
+
+from .accumulation import check_boundary
+from .flat import flat_views, flatten
+from .groups import sync_hyperparameters
+
+
+class ShardedOptimizer(Optimizer):
+    """Partitions an optimizer and its state across distributed ranks.
+
+    This is stage 1 of `ZeRO`_: every rank keeps the state of, and applies
+    the update rule to, only the parameters it owns. The updated parameters
+    are then broadcast from their owners, so all the ranks end the step with
+    the same weights while holding about ``1 / world_size`` of the state.
+    Parameters are assigned to ranks by size, largest first, to balance the
+    shards.
+
+    Gradients are expected to be reduced already, e.g. by
+    ``DistributedDataParallel``. Any backend works, including gloo on CPU::
+
+        >>> dist.init_process_group('gloo', rank=rank, world_size=world_size)
+        >>> optimizer = ShardedOptimizer(model.parameters(), NNAdam,
+        ...                              u_func=M_ABS(), lr_out=1e-3)
+
+    ``state_dict`` and ``load_state_dict`` act on the shard of the calling
+    rank, so each rank saves and restores its own file.
+
+    Arguments:
+        params (iterable): iterable of parameters to optimize or dicts defining
+            parameter groups
+        optimizer_class (type): the wrapped optimizer, e.g. :class:`NNAdam`,
+            :class:`MAdagrad`, :class:`NNRMSprop` or :class:`MSGD`
+        process_group (ProcessGroup, optional): the group to shard over
+            (default: the default process group)
+        **defaults: arguments of ``optimizer_class``
+
+    .. _ZeRO: https://arxiv.org/abs/1910.02054
+    """
+    def __init__(self,
+                 params,
+                 optimizer_class,
+                 process_group=None,
+                 **defaults):
+        if not dist.is_available() or not dist.is_initialized():
+            raise RuntimeError(
+                "ShardedOptimizer requires an initialized process group")
+        super().__init__(params, defaults)
+
+        self.process_group = process_group
+        self.rank = dist.get_rank(process_group)
+        self.world_size = dist.get_world_size(process_group)
+        if process_group is None:
+            self.ranks = list(range(self.world_size))
+        else:
+            self.ranks = dist.get_process_group_ranks(process_group)
+
+        self.partition = self.partition_params()
+        owned = set(self.partition[self.rank])
+        # Groups without a parameter on this rank are left out of the shard,
+        # so ``local_indices`` maps every group of the shard to its own
+        self.local_indices = []
+        local_groups = []
+        for i, group in enumerate(self.param_groups):
+            params = [p for p in group['params'] if p in owned]
+            if len(params) == 0:
+                continue
+            local_group = {k: v for k, v in group.items() if k != 'params'}
+            local_group['params'] = params
+            self.local_indices.append(i)
+            local_groups.append(local_group)
+        # A rank that owns no parameter, e.g. with more ranks than
+        # parameters, only receives the broadcasts
+        self.optim = None
+        if len(local_groups) > 0:
+            self.optim = optimizer_class(local_groups, **defaults)
+        self.counts = {}
+
+    def partition_params(self):
+        """Returns the parameters owned by every rank.
+
+        The assignment only depends on the parameters, so every rank
+        computes the same one.
+        """
+        params = [p for group in self.param_groups for p in group['params']]
+        partition = [[] for _ in range(self.world_size)]
+        sizes = [0] * self.world_size
+        for p in sorted(params, key=lambda p: -p.numel()):
+            rank = sizes.index(min(sizes))
+            partition[rank].append(p)
+            sizes[rank] += p.numel()
+        # Broadcast the parameters of each rank in their original order
+        order = {p: i for i, p in enumerate(params)}
+        return [sorted(ps, key=order.get) for ps in partition]
+
+    def state_dict(self):
+        # Also raises on the ranks without parameters
+        check_boundary(self.counts)
+        if self.optim is None:
+            return {}
+        return self.optim.state_dict()
+
+    def load_state_dict(self, state_dict):
+        self.counts = {}
+        if self.optim is not None:
+            self.optim.load_state_dict(state_dict)
+
+    def sync_param_groups(self):
+        """Copies hyperparameters, e.g. set by a scheduler, to the shard.
+
+        Options that take effect when the group is built, such as ``u_func``
+        or ``stochastic_rounding``, are not copied.
+        """
+        if self.optim is None:
+            return
+        for i, local_group in zip(self.local_indices,
+                                  self.optim.param_groups):
+            sync_hyperparameters(self.param_groups[i], local_group)
+
+    def updated_params(self):
+        """Returns the parameters updated by the current micro-step.
+
+        These are the parameters of the groups that end their accumulation
+        window, counted as the inner optimizer does. The count does not
+        depend on the rank, so every rank returns the same set.
+        """
+        params = set()
+        for i, group in enumerate(self.param_groups):
+            steps = group.get('accumulation_steps', 1)
+            count = 1
+            if steps > 1:
+                count = self.counts.get(i, 0) + 1
+                self.counts[i] = count % steps
+            if count == steps:
+                params.update(group['params'])
+        return params
+
+    @T.no_grad()
+    def broadcast_params(self, updated=None):
+        """Broadcasts every parameter from the rank that owns it.
+
+        The parameters of a rank are packed into one tensor per dtype and
+        device, so there is one collective per rank rather than one per
+        parameter. With ``updated``, only the parameters in it are sent.
+        """
+        for rank, params in enumerate(self.partition):
+            buckets = {}
+            for p in params:
+                if updated is not None and p not in updated:
+                    continue
+                buckets.setdefault((p.dtype, p.device), []).append(p)
+            for (dtype, device), bucket in buckets.items():
+                if rank == self.rank:
+                    flat = flatten(bucket)
+                else:
+                    flat = T.empty(sum(p.numel() for p in bucket),
+                                   dtype=dtype,
+                                   device=device)
+                dist.broadcast(flat,
+                               src=self.ranks[rank],
+                               group=self.process_group)
+                if rank != self.rank:
+                    for p, view in zip(bucket, flat_views(flat, bucket)):
+                        p.copy_(view)
+
+    def step(self, closure=None):
+        """Performs a single optimization step.
+
+        Arguments:
+            closure (callable, optional): A closure that reevaluates the model
+                and returns the loss.
+        """
+        loss = None
+        if closure is not None:
+            with T.enable_grad():
+                loss = closure()
+
+        updated = self.updated_params()
+        self.sync_param_groups()
+        if self.optim is not None:
+            self.optim.step()
+        # Nothing changed on the micro-steps inside an accumulation window
+        if len(updated) > 0:
+            self.broadcast_params(updated)
+
+        return loss
@@ -0,0 +1,41 @@
+import torch as T
+
+
+def sparse_rows(grad):
+    """Returns the rows touched by the sparse ``grad`` and their values.
+
+    The gradient is coalesced first, since the update rules are non-linear
+    and every row must be updated once. The sparse dimensions are folded
+    into a single row index into :func:`row_view` of a dense tensor.
+    """
+    grad = grad.coalesce()
+    indices = grad._indices()
+    rows = indices[0]
+    for dim in range(1, grad.sparse_dim()):
+        rows = rows * grad.size(dim) + indices[dim]
+    return rows, grad._values()
+
+
+def row_view(t, grad):
+    """Views the dense ``t`` as the rows indexed by :func:`sparse_rows`."""
+    return t.view(-1, *grad.shape[grad.sparse_dim():])
+
+
+@T.no_grad()
+def gather_rows(rows, grad, tensors):
+    """Copies the ``rows`` of every tensor into a dense tensor.
+
+    ``None`` entries, such as unused state buffers, are passed through.
+    """
+    return [
+        None if t is None else row_view(t, grad).index_select(0, rows)
+        for t in tensors
+    ]
+
+
+@T.no_grad()
+def scatter_rows_(rows, grad, tensors, gathered):
+    """Writes the tensors returned by :func:`gather_rows` back in place."""
+    for t, g in zip(tensors, gathered):
+        if t is not None:
+            row_view(t, grad).index_copy_(0, rows, g)
@@ -3,9 +3,21 @@ import torch as T
 
 class H_ABS(object):
     @T.no_grad()
-    def __call__(self, p, grad, lr_in=1.0, lr_out=1.0, lr=1.0, g=1.0):
-        p.add_((self.m_abs(p, grad, lr_in).mul(-lr_out).mul(g) +
-                grad.mul(-lr).mul(1.0 - g)))
+    def __call__(self,
+                 p,
+                 grad,
+                 lr_in=1.0,
+                 lr_out=1.0,
+                 lr=1.0,
+                 g=1.0,
+                 workspace=None):
+        # With a workspace every intermediate result is written into its
+        # two scratch tensors instead of fresh ones
+        a, b = workspace if workspace is not None else (None, None)
+        update = T.abs(p, out=a).mul_(T.mul(grad, lr_in, out=b).tanh_())
+        update.mul_(-lr_out).mul_(g)
+        update.add_(T.mul(grad, -lr, out=b).mul_(1.0 - g))
+        p.add_(update)
 
     @T.no_grad()
     def m_abs(self, p, grad, lr_in):
@@ -19,14 +31,46 @@ class H_ABS(object):
     def update(self, p, grad, lr_out=1, lr=1.0, g=1.0):
         p.add_(p.abs().mul(grad).mul(lr_out).mul(g) + grad.mul(lr).mul(1 - g))
 
+    @T.no_grad()
+    def foreach(self, params, grads, lr_in=1.0, lr_out=1.0, lr=1.0, g=1.0):
+        m_abs = T._foreach_abs(params)
+        tanh = self.foreach_tanh_part(grads, lr_in)
+        T._foreach_mul_(m_abs, tanh)
+        T._foreach_mul_(m_abs, -lr_out)
+        T._foreach_mul_(m_abs, g)
+        add = T._foreach_mul(grads, -lr)
+        T._foreach_mul_(add, 1.0 - g)
+        T._foreach_add_(m_abs, add)
+        T._foreach_add_(params, m_abs)
+
+    @T.no_grad()
+    def foreach_tanh_part(self, grads, lr_in=1):
+        tanh = T._foreach_mul(grads, lr_in)
+        T._foreach_tanh_(tanh)
+        return tanh
+
+    @T.no_grad()
+    def foreach_update(self, params, grads, lr_out=1, lr=1.0, g=1.0):
+        mul = T._foreach_abs(params)
+        T._foreach_mul_(mul, grads)
+        T._foreach_mul_(mul, lr_out)
+        T._foreach_mul_(mul, g)
+        add = T._foreach_mul(grads, lr)
+        T._foreach_mul_(add, 1 - g)
+        T._foreach_add_(mul, add)
+        T._foreach_add_(params, mul)
+
     def __repr__(self):
         return "H_ABS"
 
 
 class M_ABS(object):
     @T.no_grad()
-    def __call__(self, p, grad, lr_in=1, lr_out=1, g=None):
-        p.addcmul_(p.abs(), grad.mul(lr_in).tanh(), value=-lr_out)
+    def __call__(self, p, grad, lr_in=1, lr_out=1, g=None, workspace=None):
+        a, b = workspace if workspace is not None else (None, None)
+        p.addcmul_(T.abs(p, out=a),
+                   T.mul(grad, lr_in, out=b).tanh_(),
+                   value=-lr_out)
 
     @T.no_grad()
     def tanh_part(self, grad, lr_in=1):
@@ -36,14 +80,61 @@ class M_ABS(object):
     def update(self, p, grad, lr_out=1):
         p.addcmul_(p.abs(), grad, value=-lr_out)
 
+    @T.no_grad()
+    def foreach(self, params, grads, lr_in=1, lr_out=1, g=None):
+        T._foreach_addcmul_(params,
+                            T._foreach_abs(params),
+                            self.foreach_tanh_part(grads, lr_in),
+                            value=-lr_out)
+
+    @T.no_grad()
+    def foreach_tanh_part(self, grads, lr_in=1):
+        tanh = T._foreach_mul(grads, lr_in)
+        T._foreach_tanh_(tanh)
+        return tanh
+
+    @T.no_grad()
+    def foreach_update(self, params, grads, lr_out=1):
+        T._foreach_addcmul_(params,
+                            T._foreach_abs(params),
+                            grads,
+                            value=-lr_out)
+
     def __repr__(self):
         return "M_ABS"
 
 
+class ADD(object):
+    """The additive branch of :class:`H_ABS` alone, ``p -= lr * grad``.
+
+    This is what ``H_ABS`` computes at ``g = 0``, i.e. the plain SGD step.
+    """
+    @T.no_grad()
+    def __call__(self,
+                 p,
+                 grad,
+                 lr_in=1.0,
+                 lr_out=1.0,
+                 lr=1.0,
+                 g=None,
+                 workspace=None):
+        p.add_(grad, alpha=-lr)
+
+    @T.no_grad()
+    def foreach(self, params, grads, lr_in=1.0, lr_out=1.0, lr=1.0, g=None):
+        T._foreach_add_(params, grads, alpha=-lr)
+
+    def __repr__(self):
+        return "ADD"
+
+
 class M_SPOW(object):
     @T.no_grad()
-    def __call__(self, p, grad, lr_in=1, lr_out=1, g=None):
-        p.mul_(T.pow(2, grad.mul(lr_in).tanh().mul(lr_out).mul(-p.sign())))
+    def __call__(self, p, grad, lr_in=1, lr_out=1, g=None, workspace=None):
+        a, b = workspace if workspace is not None else (None, None)
+        exp = T.mul(grad, lr_in, out=a).tanh_().mul_(lr_out)
+        exp.mul_(T.sign(p, out=b).neg_())
+        p.mul_(T.pow(2, exp, out=exp))
 
     @T.no_grad()
     def tanh_part(self, grad, lr_in=1):
@@ -53,6 +144,25 @@ class M_SPOW(object):
     def update(self, p, grad, lr_out):
         p.mul_(T.pow(2, grad.mul(lr_out).mul(-p.sign())))
 
+    @T.no_grad()
+    def foreach(self, params, grads, lr_in=1, lr_out=1, g=None):
+        exp = self.foreach_tanh_part(grads, lr_in)
+        T._foreach_mul_(exp, lr_out)
+        T._foreach_mul_(exp, T._foreach_neg(T._foreach_sign(params)))
+        T._foreach_mul_(params, T._foreach_pow(2, exp))
+
+    @T.no_grad()
+    def foreach_tanh_part(self, grads, lr_in=1):
+        tanh = T._foreach_mul(grads, lr_in)
+        T._foreach_tanh_(tanh)
+        return tanh
+
+    @T.no_grad()
+    def foreach_update(self, params, grads, lr_out):
+        exp = T._foreach_mul(grads, lr_out)
+        T._foreach_mul_(exp, T._foreach_neg(T._foreach_sign(params)))
+        T._foreach_mul_(params, T._foreach_pow(2, exp))
+
     def __repr__(self):
         return "M_SPOW"
 
@@ -63,6 +173,11 @@ class N_Clip(object):
         if p.grad is not None:
             p.add_(grad, alpha=-lr).clamp_min_(0)
 
+    @T.no_grad()
+    def foreach(self, params, grads, lr):
+        T._foreach_add_(params, grads, alpha=-lr)
+        T._foreach_clamp_min_(params, 0)
+
     def __repr__(self):
         return "N_CLIP"
 
@@ -73,5 +188,125 @@ class N_ABS(object):
         if p.grad is not None:
             p.add_(grad, alpha=-lr).abs_()
 
+    @T.no_grad()
+    def foreach(self, params, grads, lr):
+        T._foreach_add_(params, grads, alpha=-lr)
+        T._foreach_abs_(params)
+
     def __repr__(self):
         return "N_ABS"
+
+
+class StochasticRounding(object):
+    """Applies ``rule`` to bfloat16 parameters in float32 and writes the
+    result back with stochastic rounding.
+
+    Multiplicative updates such as ``p * 2^(-lr_out * tanh(...))`` are mostly
+    smaller than the bfloat16 spacing around ``p`` and vanish under round to
+    nearest. Stochastic rounding keeps them in expectation, without a float32
+    copy of the parameters. Other dtypes are passed to ``rule`` unchanged.
+    """
+    def __init__(self, rule):
+        self.rule = rule
+
+    @T.no_grad()
+    def __call__(self, p, grad, workspace=None, **kwargs):
+        if p.dtype != T.bfloat16:
+            if workspace is not None:
+                kwargs['workspace'] = workspace
+            self.rule(p, grad, **kwargs)
+            return
+        p_fp32 = p.float()
+        self.rule(p_fp32, grad.float(), **kwargs)
+        stochastic_round_(p, p_fp32)
+
+    @T.no_grad()
+    def tanh_part(self, grad, lr_in=1):
+        return self.rule.tanh_part(grad, lr_in)
+
+    @T.no_grad()
+    def update(self, p, grad, **kwargs):
+        if p.dtype != T.bfloat16:
+            self.rule.update(p, grad, **kwargs)
+            return
+        p_fp32 = p.float()
+        self.rule.update(p_fp32, grad.float(), **kwargs)
+        stochastic_round_(p, p_fp32)
+
+    @T.no_grad()
+    def foreach(self, params, grads, **kwargs):
+        for p, grad in zip(params, grads):
+            self(p, grad, **kwargs)
+
+    @T.no_grad()
+    def foreach_tanh_part(self, grads, lr_in=1):
+        return foreach_tanh_part(self.rule, grads, lr_in)
+
+    @T.no_grad()
+    def foreach_update(self, params, grads, **kwargs):
+        for p, grad in zip(params, grads):
+            self.update(p, grad, **kwargs)
+
+    def __repr__(self):
+        return "SR({})".format(self.rule)
+
+
+# The rules that H_ABS reduces to when g is saturated
+SATURATED_RULES = {0: ADD(), 1: M_ABS()}
+
+
+def saturate(u_func, g, lr):
+    """Drops the dead branch of :class:`H_ABS` when ``g`` is exactly 0 or 1.
+
+    Returns the rule to apply and the ``lr`` to pass to it, which is ``None``
+    for :class:`M_ABS` since it takes none. Other rules, and a ``g`` given
+    as a tensor, whose value is not known on the host, are kept unchanged.
+    """
+    if (type(u_func) is not H_ABS or isinstance(g, T.Tensor)
+            or g not in SATURATED_RULES):
+        return u_func, lr
+    return SATURATED_RULES[g], lr if g == 0 else None
+
+
+@T.no_grad()
+def stochastic_round_(dst, src):
+    """Writes the float32 ``src`` into the bfloat16 ``dst``.
+
+    Random bits are added to the 16 low bits of ``src`` that bfloat16 drops,
+    so it is rounded away from zero with a probability equal to its distance
+    from the truncated value.
+    """
+    bits = src.view(T.int32)
+    bits = bits + T.randint_like(bits, 1 << 16)
+    bits.bitwise_and_(-65536)
+    dst.copy_(T.where(T.isfinite(src), bits.view(T.float32), src))
+
+
+@T.no_grad()
+def foreach_u_func(u_func, params, grads, **kwargs):
+    """Applies ``u_func`` on whole tensor lists.
+
+    Rules that do not provide a ``foreach`` variant (e.g. plain functions)
+    are applied one tensor at a time.
+    """
+    if hasattr(u_func, 'foreach'):
+        u_func.foreach(params, grads, **kwargs)
+    else:
+        for p, grad in zip(params, grads):
+            u_func(p, grad, **kwargs)
+
+
+@T.no_grad()
+def foreach_tanh_part(u_func, grads, lr_in=1):
+    if hasattr(u_func, 'foreach_tanh_part'):
+        return u_func.foreach_tanh_part(grads, lr_in)
+    return [u_func.tanh_part(grad, lr_in) for grad in grads]
+
+
+@T.no_grad()
+def foreach_update(u_func, params, grads, **kwargs):
+    if hasattr(u_func, 'foreach_update'):
+        u_func.foreach_update(params, grads, **kwargs)
+    else:
+        for p, grad in zip(params, grads):
+            u_func.update(p, grad, **kwargs)
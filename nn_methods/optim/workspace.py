@@ -0,0 +1,48 @@
+import threading
+
+import torch as T
+
+
+class Workspace(object):
+    """Scratch tensors reused by every parameter and every step.
+
+    One set of ``size`` buffers is kept per dtype, device and thread, so the
+    chunks of a group updated from several threads do not share scratch
+    space. It grows to the largest parameter it has seen, so after the first
+    step no temporaries are allocated by the update.
+    """
+    def __init__(self, size=3):
+        self.size = size
+        self.buffers = {}
+
+    def __call__(self, p):
+        """Returns ``size`` scratch tensors shaped like ``p``."""
+        key = (p.dtype, p.device, threading.get_ident())
+        numel = p.numel()
+        buffers = self.buffers.get(key)
+        if buffers is None or buffers[0].numel() < numel:
+            buffers = [
+                T.empty(numel, dtype=p.dtype, device=p.device)
+                for _ in range(self.size)
+            ]
+            self.buffers[key] = buffers
+        return [b[:numel].view(p.shape) for b in buffers]
+
+    def clear(self):
+        self.buffers = {}
+
+    def __repr__(self):
+        return "Workspace({})".format(self.size)
+
+
+def scratch(workspace, p):
+    """Returns the scratch tensors of ``p`` and the kwargs of its update rule.
+
+    The first tensor is left to the optimizer and the rest are handed to
+    the rule. Without a workspace all tensors are ``None``, so ``out=``
+    arguments fall back to allocating.
+    """
+    if workspace is None:
+        return [None, None, None], {}
+    buffers = workspace(p)
+    return buffers, dict(workspace=buffers[1:])
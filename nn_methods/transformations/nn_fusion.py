@@ -0,0 +1,29 @@
+import torch as T
+from nn_methods.nn.activations.relus import ReLU2, ReLU6, ReLUN
+from nn_methods.nn.nn_conv2d import NNConv2d
+from nn_methods.nn.nn_layer import NNLinear
+
+
+def fuse_bounded_relus(model):
+    """Moves every bounded ReLU that follows an NN layer into the layer.
+
+    In every ``nn.Sequential`` of ``model``, an :class:`NNLinear` or
+    :class:`NNConv2d` directly followed by a :class:`ReLUN`,
+    :class:`ReLU6` or :class:`ReLU2` takes the bound of the activation as
+    its ``activation_bound``, and the activation is replaced by
+    ``nn.Identity``. Only sequential containers are fused, since the order
+    in which other modules call their children is not known. Layers that
+    are not followed by an activation, e.g. the one producing the logits,
+    are left unchanged. Returns ``model``.
+    """
+    for module in model.modules():
+        if not isinstance(module, T.nn.Sequential):
+            continue
+        for k in range(len(module) - 1):
+            layer, activation = module[k], module[k + 1]
+            if (isinstance(layer, (NNLinear, NNConv2d))
+                    and isinstance(activation, (ReLUN, ReLU6, ReLU2))
+                    and layer.activation_bound is None):
+                layer.activation_bound = activation.bound
+                module[k + 1] = T.nn.Identity()
+    return model
@@ -0,0 +1,101 @@
+import copy
+import io
+
+import torch as T
+from nn_methods.nn.nn_conv2d import NNConv2d
+from nn_methods.nn.nn_layer import NNLinear
+from nn_methods.nn.quantized import QuantizedNNConv2d, QuantizedNNLinear
+from torch.ao.quantization import MinMaxObserver
+
+
+def nn_quantization(model, calibration_data, backend='fbgemm'):
+    """Returns a copy of a converted model with uint8 NN layers.
+
+    Every :class:`NNLinear` and :class:`NNConv2d` of the output of
+    ``nn_transformation`` is replaced by its quantized version. The ranges of
+    their outputs are observed on ``calibration_data``, an iterable of
+    inputs or of ``(input, target)`` pairs. The model runs on the CPU with
+    the ``backend`` quantized engine, ``'fbgemm'`` or ``'onednn'``.
+    """
+    T.backends.quantized.engine = backend
+    model = copy.deepcopy(model).cpu().eval()
+
+    layers = {
+        name: module
+        for name, module in model.named_modules()
+        if isinstance(module, (NNLinear, NNConv2d))
+    }
+    observers = {
+        name: MinMaxObserver(dtype=T.quint8, reduce_range=False)
+        for name in layers
+    }
+    handles = [
+        layer.register_forward_hook(
+            lambda module, input, output, name=name: observers[name](output))
+        for name, layer in layers.items()
+    ]
+    with T.no_grad():
+        for batch in calibration_data:
+            model(_inputs(batch))
+    for handle in handles:
+        handle.remove()
+
+    for name, layer in layers.items():
+        scale, zero_point = observers[name].calculate_qparams()
+        qparams = (float(scale), int(zero_point))
+        if isinstance(layer, NNLinear):
+            quantized = QuantizedNNLinear(layer, qparams, backend)
+        else:
+            quantized = QuantizedNNConv2d(layer, qparams, backend)
+        parent_name, _, child_name = name.rpartition('.')
+        parent = model.get_submodule(parent_name) if parent_name else model
+        setattr(parent, child_name, quantized)
+    return model
+
+
+def accuracy_report(model, quantized_model, data):
+    """Compares a quantized model with the float model it comes from.
+
+    ``data`` is an iterable of ``(input, target)`` pairs of a classification
+    task. Returns the top-1 accuracy of both models, the fraction of inputs
+    on which they agree, the largest absolute difference of their outputs
+    and the size of both serialized models in bytes. The float model runs
+    from a copy on the CPU, where the quantized one runs, so neither its
+    device nor its mode change.
+    """
+    model = copy.deepcopy(model).cpu().eval()
+    training = quantized_model.training
+    quantized_model.eval()
+    total = correct = quantized_correct = agree = 0
+    max_error = 0.0
+    with T.no_grad():
+        for input, target in data:
+            input, target = input.cpu(), target.cpu()
+            output = model(input)
+            quantized_output = quantized_model(input)
+            pred = output.argmax(dim=1)
+            quantized_pred = quantized_output.argmax(dim=1)
+            total += target.numel()
+            correct += (pred == target).sum().item()
+            quantized_correct += (quantized_pred == target).sum().item()
+            agree += (pred == quantized_pred).sum().item()
+            max_error = max(max_error,
+                            (output - quantized_output).abs().max().item())
+    quantized_model.train(training)
+
+    return dict(accuracy=correct / total,
+                quantized_accuracy=quantized_correct / total,
+                agreement=agree / total,
+                max_abs_error=max_error,
+                size=_serialized_size(model),
+                quantized_size=_serialized_size(quantized_model))
+
+
+def _inputs(batch):
+    return batch[0] if isinstance(batch, (list, tuple)) else batch
+
+
+def _serialized_size(model):
+    buffer = io.BytesIO()
+    T.save(model.state_dict(), buffer)
+    return buffer.tell()
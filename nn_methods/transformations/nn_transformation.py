@@ -1,8 +1,9 @@
 import torch as T
 from nn_methods.nn.nn_layer import NNLinear
+from nn_methods.transformations.nn_fusion import fuse_bounded_relus
 
 
-def nn_transformation(model):
+def nn_transformation(model, packed=False, fuse_activations=False):
     b_new_list = [None for _ in range(len(model.layers))]
     act_shift_list = [None for _ in range(len(model.layers))]
 
@@ -29,8 +30,12 @@ def nn_transformation(model):
                 b_new,
                 model.alpha[i],
                 act_shift,
+                packed=packed,
             ))
 
+    if fuse_activations:
+        # Bounded ReLUs after the layers run in place inside them
+        fuse_bounded_relus(nn_model)
     return nn_model
 
 
@@ -1,9 +1,13 @@
 import torch as T
 from nn_methods.nn.nn_conv2d import NNConv2d
 from nn_methods.nn.nn_layer import NNLinear
+from nn_methods.transformations.nn_fusion import fuse_bounded_relus
 
 
-def nn_transformation(model):
+def nn_transformation(model,
+                      packed=False,
+                      memory_format=T.contiguous_format,
+                      fuse_activations=False):
     b_new_list = [None for _ in range(len(model.layers))]
     act_shift_list = [None for _ in range(len(model.layers))]
 
@@ -37,6 +41,7 @@ def nn_transformation(model):
                 b_new,
                 model.alpha[i],
                 act_shift,
+                packed=packed,
             )
         elif classname.find('Conv2d') != -1:
             new_layer = NNConv2d(
@@ -53,10 +58,15 @@ def nn_transformation(model):
                 dilation=cur_layer.dilation,
                 groups=cur_layer.groups,
                 padding_mode=cur_layer.padding_mode,
+                packed=packed,
+                memory_format=memory_format,
             )
         else:
             raise Exception("This layer type cannot be converted")
         nn_model.add_layer(new_layer)
+    if fuse_activations:
+        # Bounded ReLUs after the layers run in place inside them
+        fuse_bounded_relus(nn_model)
     return nn_model
 
 
@@ -0,0 +1,51 @@
+import pytest
+import torch as T
+from nn_methods.optim import M_ABS, MSGD, NNAdam
+
+
+OPTIMIZERS = [
+    lambda params: MSGD(params,
+                        u_func=M_ABS(),
+                        lr_in=0.1,
+                        lr_out=0.1,
+                        momentum=0.9,
+                        accumulation_steps=2),
+    lambda params: NNAdam(
+        params, u_func=M_ABS(), lr_out=0.1, accumulation_steps=2),
+    lambda params: NNAdam(params,
+                          u_func=M_ABS(),
+                          lr_out=0.1,
+                          flat=True,
+                          accumulation_steps=2),
+]
+
+
+@pytest.mark.parametrize('make', OPTIMIZERS)
+def test_state_dict_only_between_windows(make):
+    T.manual_seed(0)
+    model = T.nn.Linear(4, 3)
+    optimizer = make(model.parameters())
+
+    def micro_step():
+        model.zero_grad()
+        model(T.randn(2, 4)).sum().backward()
+        optimizer.step()
+
+    micro_step()
+    with pytest.raises(RuntimeError):
+        optimizer.state_dict()
+
+    micro_step()
+    state = optimizer.state_dict()
+
+    # A resumed optimizer starts a new window, even if one was open
+    micro_step()
+    optimizer.load_state_dict(state)
+    before = [p.clone() for p in model.parameters()]
+    micro_step()
+    for p, b in zip(model.parameters(), before):
+        assert T.equal(p, b)
+    with pytest.raises(RuntimeError):
+        optimizer.state_dict()
+    micro_step()
+    optimizer.state_dict()
@@ -0,0 +1,28 @@
+import torch as T
+from nn_methods.optim import M_ABS, BackwardOptimizer, NNAdam
+from nn_methods.optim.updates import StochasticRounding
+
+
+def test_stochastic_rounding_through_hook():
+    T.manual_seed(0)
+    p = T.nn.Parameter(T.ones(4096, dtype=T.bfloat16))
+    optimizer = BackwardOptimizer([p],
+                                  NNAdam,
+                                  u_func=M_ABS(),
+                                  lr_out=1e-3,
+                                  stochastic_rounding=True)
+    reference = T.nn.Parameter(T.ones(4096))
+    reference_optimizer = NNAdam([reference], u_func=M_ABS(), lr_out=1e-3)
+
+    for _ in range(20):
+        p.sum().backward()
+        reference.grad = T.ones_like(reference)
+        reference_optimizer.step()
+
+    assert isinstance(optimizer.optims[p].param_groups[0]['u_func'],
+                      StochasticRounding)
+    assert p.grad is None
+    # Every update is below the bfloat16 spacing around 1 and would be lost
+    # with round to nearest
+    assert reference.mean() < 0.99
+    assert abs(p.float().mean() - reference.mean()) < 1e-3
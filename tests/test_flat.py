@@ -0,0 +1,22 @@
+import torch as T
+from nn_methods.optim import M_ABS, NNAdam
+
+
+def test_flat_group_follows_moved_parameters():
+    T.manual_seed(0)
+    model = T.nn.Sequential(T.nn.Linear(4, 5), T.nn.Linear(5, 3))
+    optimizer = NNAdam(model.parameters(),
+                       u_func=M_ABS(),
+                       lr_out=0.1,
+                       flat=True)
+    model(T.randn(2, 4)).sum().backward()
+    optimizer.step()
+
+    # New storage for every parameter, which the flat group must follow
+    model.double()
+    before = [p.clone() for p in model.parameters()]
+    model.zero_grad()
+    model(T.randn(2, 4, dtype=T.float64)).sum().backward()
+    optimizer.step()
+    for p, b in zip(model.parameters(), before):
+        assert not T.equal(p, b)
@@ -0,0 +1,51 @@
+import pytest
+import torch as T
+import torch.nn.functional as F
+from nn_methods.nn.functional import nn_conv2d, nn_linear
+
+
+def tensors(*shapes):
+    return [
+        T.rand(shape, dtype=T.float64, requires_grad=True) for shape in shapes
+    ]
+
+
+def test_nn_linear_gradcheck():
+    T.manual_seed(0)
+    x, w_pos, w_neg, bias = tensors((2, 3, 5), (4, 5), (4, 5), (4, ))
+    alpha = T.tensor(2., dtype=T.float64)
+    shift = T.tensor(0.5, dtype=T.float64)
+    expected = (F.linear(x, w_pos) + F.linear(alpha - x, w_neg) + bias -
+                shift)
+    assert T.allclose(nn_linear(x, w_pos, w_neg, bias, alpha, shift),
+                      expected)
+    assert T.autograd.gradcheck(
+        lambda *args: nn_linear(*args, alpha, shift), (x, w_pos, w_neg, bias))
+
+
+@pytest.mark.parametrize('stride, padding, dilation, groups', [
+    (1, 0, 1, 1),
+    (2, 1, 1, 1),
+    (1, 2, 2, 1),
+    ((2, 1), (1, 0), 1, 2),
+])
+def test_nn_conv2d_gradcheck(stride, padding, dilation, groups):
+    T.manual_seed(0)
+    x, w_pos, w_neg, bias = tensors((2, 4, 7, 6), (6, 4 // groups, 3, 3),
+                                    (6, 4 // groups, 3, 3), (6, ))
+    alpha = T.tensor(2., dtype=T.float64)
+    shift = T.tensor(0.5, dtype=T.float64)
+
+    def fn(*args):
+        return nn_conv2d(*args, alpha, shift, stride, padding, dilation,
+                         groups)
+
+    conv = dict(stride=stride,
+                padding=padding,
+                dilation=dilation,
+                groups=groups)
+    expected = (F.conv2d(x, w_pos, **conv) +
+                F.conv2d(alpha - x, w_neg, **conv) +
+                (bias - shift).view(-1, 1, 1))
+    assert T.allclose(fn(x, w_pos, w_neg, bias), expected)
+    assert T.autograd.gradcheck(fn, (x, w_pos, w_neg, bias))
@@ -0,0 +1,97 @@
+import copy
+
+import pytest
+import torch as T
+from nn_methods.optim import H_ABS, HAdagrad, HAdam, HMSGD, HRMSprop
+from nn_methods.optim.schedulers.g_scheduler import GSchedule
+
+# g from 0.5 to 0.1 over 4 iterations, after 2 patient iterations
+SHAPES = [
+    ('exponential', [0.5, 0.33437, 0.223607, 0.149535, 0.1]),
+    ('inverse', [0.5, 0.420854, 0.32918, 0.222994, 0.1]),
+    ('cosine', [0.5, 0.441421, 0.3, 0.158579, 0.1]),
+    ('linear', [0.5, 0.4, 0.3, 0.2, 0.1]),
+]
+
+OPTIMIZERS = [
+    (HMSGD, dict(lr_in=0.5, lr_out=0.1, lr=0.05, momentum=0.9)),
+    (HAdam, dict(lr_out=0.1, lr=0.05)),
+    (HRMSprop, dict(lr_out=0.1, lr=0.05)),
+    (HAdagrad, dict(lr_out=0.1, lr=0.05)),
+    (HAdam, dict(lr_out=0.1, lr=0.05, capturable=True)),
+    (HRMSprop, dict(lr_out=0.1, lr=0.05, capturable=True)),
+    (HAdagrad, dict(lr_out=0.1, lr=0.05, capturable=True)),
+]
+
+
+@pytest.mark.parametrize('shape,values', SHAPES)
+def test_schedule_values(shape, values):
+    model = T.nn.Linear(3, 2)
+    optimizer = HMSGD(model.parameters(),
+                      u_func=H_ABS(),
+                      lr_in=0.5,
+                      lr_out=0.1,
+                      lr=0.05,
+                      g=0.5)
+    schedule = GSchedule(optimizer,
+                         total_steps=4,
+                         g_end=0.1,
+                         shape=shape,
+                         patient_steps=2)
+    expected = [1., 1.] + values + [0.1, 0.1]
+    for i, g in enumerate(expected):
+        if i > 0:
+            schedule.step()
+        current = optimizer.param_groups[0]['g'].item()
+        assert current == pytest.approx(g, abs=1e-6)
+
+
+@pytest.mark.parametrize('optim_class,kwargs', OPTIMIZERS)
+def test_state_dict_round_trip(optim_class, kwargs):
+    T.manual_seed(0)
+    model = T.nn.Linear(3, 2)
+    other = T.nn.Linear(3, 2)
+    other.load_state_dict(model.state_dict())
+    inputs = T.randn(6, 2, 3)
+
+    def make(model, g):
+        if kwargs.get('capturable', False):
+            g = T.tensor(g)
+        optimizer = optim_class(model.parameters(),
+                                u_func=H_ABS(),
+                                g=g,
+                                **kwargs)
+        return optimizer, GSchedule(optimizer,
+                                    total_steps=4,
+                                    g_end=0.1,
+                                    shape='cosine',
+                                    patient_steps=1)
+
+    def step(model, optimizer, schedule, x):
+        model.zero_grad()
+        model(x).sum().backward()
+        optimizer.step()
+        schedule.step()
+
+    optimizer, schedule = make(model, 0.5)
+    for x in inputs[:3]:
+        step(model, optimizer, schedule, x)
+    # Copied as a checkpoint, which owns its tensors
+    state = copy.deepcopy(
+        dict(optimizer=optimizer.state_dict(), schedule=schedule.state_dict()))
+    other_optimizer, other_schedule = make(other, 0.9)
+    other_optimizer.load_state_dict(state['optimizer'])
+    other_schedule.load_state_dict(state['schedule'])
+    for p, q in zip(model.parameters(), other.parameters()):
+        q.data.copy_(p)
+
+    for x in inputs[3:]:
+        step(model, optimizer, schedule, x)
+        step(other, other_optimizer, other_schedule, x)
+        g = optimizer.param_groups[0]['g']
+        other_g = other_optimizer.param_groups[0]['g']
+        assert other_g.dim() == 0
+        assert T.equal(other_g, g)
+        for p, q in zip(model.parameters(), other.parameters()):
+            assert T.equal(p, q)
+    assert g.item() == pytest.approx(0.1)
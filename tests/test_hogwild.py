@@ -0,0 +1,30 @@
+import pytest
+import torch as T
+from nn_methods.optim import M_ABS, MSGD
+
+
+@pytest.mark.parametrize('momentum_type', [None, 'tanh'])
+def test_shared_momentum_matches_lazy_buffer(momentum_type):
+    params = []
+    for share in (False, True):
+        T.manual_seed(0)
+        p = T.nn.Parameter(T.rand(20))
+        optimizer = MSGD([p],
+                         u_func=M_ABS(),
+                         lr_in=1.0,
+                         lr_out=0.1,
+                         momentum=0.9,
+                         dampening=0.1,
+                         momentum_type=momentum_type)
+        if share:
+            optimizer.share_memory()
+        buf = optimizer.state[p].get('momentum_buffer')
+        for _ in range(3):
+            p.grad = T.randn(20)
+            optimizer.step()
+        if share:
+            # The buffer is updated in place and stays in shared memory
+            assert optimizer.state[p]['momentum_buffer'] is buf
+            assert buf.is_shared()
+        params.append(p.detach())
+    assert T.equal(params[0], params[1])
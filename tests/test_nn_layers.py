@@ -0,0 +1,58 @@
+import pytest
+import torch as T
+from nn_methods.nn.nn_conv2d import NNConv2d
+from nn_methods.nn.nn_layer import NNLinear
+
+
+def linear(device):
+    w = T.randn(4, 5, device=device)
+    return NNLinear(5, 4, T.clamp_min(w, 0), T.clamp_min(-w, 0),
+                    T.randn(4, device=device), 2., 0.5)
+
+
+def conv(device):
+    w = T.randn(6, 3, 3, 3, device=device)
+    return NNConv2d(3, 6, 3, T.clamp_min(w, 0), T.clamp_min(-w, 0),
+                    T.randn(6, device=device), 2., 0.5, padding=1)
+
+
+@pytest.mark.parametrize('layer, shape', [(linear, (8, 5)),
+                                          (conv, (2, 3, 7, 7))])
+def test_meta_layer_materializes(layer, shape):
+    T.manual_seed(0)
+    expected = layer('cpu')
+    model = layer('meta')
+    # Scalars are built on the device of the weights
+    assert all(t.is_meta for t in model.state_dict().values())
+    model.to_empty(device='cpu').load_state_dict(expected.state_dict())
+    x = 2 * T.rand(shape)
+    assert T.allclose(model(x), expected(x))
+    with T.no_grad():
+        assert T.allclose(model.fold().eval()(x), expected(x), atol=1e-5)
+
+
+def invalidate(layer):
+    layer.fold_cache.invalidate()
+
+
+def retrain(layer):
+    layer.train().eval()
+
+
+@pytest.mark.parametrize('refresh', [invalidate, retrain])
+@pytest.mark.parametrize('layer, shape', [(linear, (8, 5)),
+                                          (conv, (2, 3, 7, 7))])
+def test_folded_layer_follows_data_writes(refresh, layer, shape):
+    T.manual_seed(0)
+    model = layer('cpu').fold().eval()
+    x = 2 * T.rand(shape)
+    with T.no_grad():
+        model(x)
+        # Writes through .data bump no version counter of the parameters
+        for p in model.weight_parameters():
+            p.data.mul_(2)
+        refresh(model)
+        output = model(x)
+        model.folded = False
+        expected = model(x)
+    assert T.allclose(output, expected, atol=1e-5)
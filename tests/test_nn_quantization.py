@@ -0,0 +1,85 @@
+import pytest
+import torch as T
+from nn_methods.nn.nn_conv2d import NNConv2d
+from nn_methods.nn.nn_layer import NNLinear
+from nn_methods.nn.quantized import QuantizedNNConv2d, QuantizedNNLinear
+from nn_methods.transformations.nn_quantization import (accuracy_report,
+                                                        nn_quantization)
+
+
+def linear():
+    return NNLinear(16,
+                    10,
+                    T.rand(10, 16) / 16,
+                    T.rand(10, 16) / 16,
+                    T.randn(10),
+                    T.tensor(1.),
+                    T.tensor(0.5))
+
+
+def conv():
+    return NNConv2d(4,
+                    8,
+                    3,
+                    T.rand(8, 2, 3, 3) / 8,
+                    T.rand(8, 2, 3, 3) / 8,
+                    T.randn(8),
+                    T.tensor(1.),
+                    T.tensor(0.5),
+                    padding=1,
+                    groups=2)
+
+
+@pytest.mark.parametrize('backend', ['fbgemm', 'onednn'])
+@pytest.mark.parametrize('layer, shape', [(linear, (64, 16)),
+                                          (conv, (8, 4, 6, 6))])
+def test_quantized_outputs_follow_float(backend, layer, shape):
+    if backend not in T.backends.quantized.supported_engines:
+        pytest.skip("{} is not available".format(backend))
+    T.manual_seed(0)
+    model = T.nn.Sequential(layer())
+    # Inputs span [0, alpha], so both x and its complement are exercised
+    calibration_data = [T.rand(shape) for _ in range(4)]
+    quantized_model = nn_quantization(model, calibration_data, backend)
+
+    x = T.rand(shape)
+    with T.no_grad():
+        expected = model(x)
+        output = quantized_model(x)
+    error = (output - expected).abs().max()
+    assert error < 0.02 * (expected.max() - expected.min())
+
+
+@pytest.mark.parametrize('layer, quantized_class, shape', [
+    (linear, QuantizedNNLinear, (64, 16)),
+    (conv, QuantizedNNConv2d, (8, 4, 6, 6)),
+])
+def test_quantized_layer_keeps_activation_bound(layer, quantized_class,
+                                                shape):
+    T.manual_seed(0)
+    float_layer = layer()
+    float_layer.activation_bound = 0.25
+    # An output range wider than the bound, e.g. calibrated without it
+    quantized = quantized_class(float_layer, (4 / 255, 128),
+                                T.backends.quantized.engine)
+
+    x = T.rand(shape)
+    with T.no_grad():
+        expected = float_layer(x)
+        output = quantized(x)
+    assert (expected == 0.25).any() and (expected == 0).any()
+    # Up to the rounding of the bound to the output grid
+    assert output.min() >= 0 and output.max() <= 0.25 + 2 / 255
+    assert (output - expected).abs().max() < 4 / 255
+
+
+def test_accuracy_report_leaves_model_unchanged():
+    T.manual_seed(0)
+    model = T.nn.Sequential(linear()).train()
+    data = [(T.rand(32, 16), T.randint(10, (32, ))) for _ in range(2)]
+    quantized_model = nn_quantization(model, [x for x, _ in data])
+    report = accuracy_report(model, quantized_model, data)
+
+    assert model.training
+    assert report['agreement'] > 0.9
+    assert report['quantized_size'] < report['size']
@@ -0,0 +1,74 @@
+import torch as T
+from nn_methods.nn.activations.relus import ReLUN
+from nn_methods.transformations import (nn_transformation,
+                                        nn_transformation_conv)
+
+
+class NNNet(T.nn.Module):
+    """Stacks converted layers with the ReLUN bounding the input of each."""
+    def __init__(self):
+        super().__init__()
+        self.body = T.nn.Sequential()
+
+    def add_layer(self, layer):
+        if len(self.body) > 0:
+            self.body.append(ReLUN(float(layer.alpha)))
+        self.body.append(layer)
+
+    def forward(self, x):
+        return self.body(x)
+
+
+class Net(T.nn.Module):
+    def __init__(self, layers, alpha):
+        super().__init__()
+        self.layers = T.nn.ModuleList(layers)
+        self.alpha = alpha
+        with T.no_grad():
+            # With non-positive biases the conversion is exact
+            for layer in self.layers:
+                layer.bias.copy_(-T.rand_like(layer.bias))
+
+    def forward(self, x):
+        for i, layer in enumerate(self.layers):
+            if i > 0:
+                x = ReLUN(float(self.alpha[i]))(x)
+            x = layer(x)
+        return x
+
+    def get_nn_net(self):
+        return NNNet()
+
+
+def check_fused(model, nn_model, x):
+    layers = [m for m in nn_model.body if not isinstance(m, T.nn.Identity)]
+    assert not any(isinstance(m, ReLUN) for m in nn_model.body)
+    assert [m.activation_bound for m in layers] == [
+        float(alpha) for alpha in model.alpha[1:]
+    ] + [None]
+
+    with T.no_grad():
+        expected = model(x)
+        output = nn_model(x)
+    # The logits are not clamped by the last layer
+    assert (expected < 0).any()
+    assert T.allclose(output, expected, atol=1e-5)
+
+
+def test_fuse_activations_linear():
+    T.manual_seed(0)
+    alpha = [T.tensor(1.), T.tensor(6.), T.tensor(2.)]
+    model = Net([T.nn.Linear(8, 16), T.nn.Linear(16, 16), T.nn.Linear(16, 4)],
+                alpha)
+    nn_model = nn_transformation.nn_transformation(model,
+                                                   fuse_activations=True)
+    check_fused(model, nn_model, T.rand(32, 8))
+
+
+def test_fuse_activations_conv():
+    T.manual_seed(0)
+    alpha = [T.tensor(1.), T.tensor(6.)]
+    model = Net([T.nn.Conv2d(3, 8, 3), T.nn.Conv2d(8, 4, 3)], alpha)
+    nn_model = nn_transformation_conv.nn_transformation(
+        model, fuse_activations=True)
+    check_fused(model, nn_model, T.rand(2, 3, 10, 10))
@@ -0,0 +1,40 @@
+import pytest
+import torch as T
+from nn_methods.nn.nn_layer import NNLinear
+from nn_methods.optim import H_ABS, HMSGD, M_ABS, MSGD, N_Clip
+from nn_methods.optim.custom_sgd import CustomSGD
+
+
+def layer(packed):
+    T.manual_seed(0)
+    w = T.randn(4, 5)
+    return NNLinear(5, 4, T.clamp_min(w, 0), T.clamp_min(-w, 0), T.zeros(4),
+                    T.tensor(1.), T.tensor(0.), packed=packed)
+
+
+def test_packed_follows_unpacked():
+    weights = []
+    for packed in (False, True):
+        model = layer(packed)
+        optimizer = MSGD(model.parameters(),
+                         u_func=M_ABS(),
+                         lr_in=0.5,
+                         lr_out=0.1,
+                         momentum=0.9)
+        T.manual_seed(1)
+        for _ in range(3):
+            optimizer.zero_grad()
+            model(T.rand(8, 5)).pow(2).sum().backward()
+            optimizer.step()
+        weights.append(T.stack(model.weights()))
+    assert T.allclose(weights[0], weights[1])
+
+
+@pytest.mark.parametrize('optimizer_class, u_func, kwargs', [
+    (CustomSGD, N_Clip(), dict(lr=0.1)),
+    (HMSGD, H_ABS(), dict(lr=0.1, lr_in=0.5, lr_out=0.1, g=0.5)),
+])
+def test_packed_warns_on_sign_changing_rules(optimizer_class, u_func,
+                                             kwargs):
+    with pytest.warns(UserWarning, match='packed'):
+        optimizer_class(layer(True).parameters(), u_func=u_func, **kwargs)
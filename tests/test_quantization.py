@@ -0,0 +1,33 @@
+import pytest
+import torch as T
+from nn_methods.optim import MAdagrad, NNAdam, NNRMSprop
+
+
+def plain_step(p, grad, lr_in=1.0, lr_out=1.0, g=1.0):
+    # The update of the optimizer as it is, with nothing to saturate it
+    p.add_(grad, alpha=-lr_out)
+
+
+def train(optimizer_class, quantize_state, steps=200):
+    T.manual_seed(0)
+    generator = T.Generator().manual_seed(0)
+    # Gradients over three orders of magnitude within every block
+    scales = 10**(-3 * T.rand(8192, generator=generator))
+    start = T.randn(8192, generator=generator)
+    p = T.nn.Parameter(start.clone())
+    optimizer = optimizer_class([p],
+                                u_func=plain_step,
+                                lr_out=1e-3,
+                                quantize_state=quantize_state)
+    for _ in range(steps):
+        p.grad = (T.randn(8192, generator=generator) + 0.5) * scales
+        optimizer.step()
+    return start, p.detach()
+
+
+@pytest.mark.parametrize('optimizer_class', [NNAdam, MAdagrad, NNRMSprop])
+def test_quantized_state_follows_full_precision(optimizer_class):
+    start, expected = train(optimizer_class, quantize_state=False)
+    _, output = train(optimizer_class, quantize_state=True)
+    error = (output - expected).norm() / (expected - start).norm()
+    assert error < 0.1
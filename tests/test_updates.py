@@ -0,0 +1,76 @@
+import pytest
+import torch as T
+from nn_methods.optim import (ADD, H_ABS, HMSGD, M_ABS, M_SPOW, MSGD, N_ABS,
+                              N_Clip)
+
+RULES = [
+    (H_ABS(), dict(lr_in=0.5, lr_out=0.1, lr=0.05, g=0.3)),
+    (M_ABS(), dict(lr_in=0.5, lr_out=0.1)),
+    (M_SPOW(), dict(lr_in=0.5, lr_out=0.1)),
+    (ADD(), dict(lr=0.1)),
+    (N_Clip(), dict(lr=0.1)),
+    (N_ABS(), dict(lr=0.1)),
+]
+
+
+def tensors():
+    return [T.randn(shape) for shape in [(5, ), (3, 4), (2, 3, 4)]]
+
+
+@pytest.mark.parametrize('rule, kwargs', RULES, ids=repr)
+def test_foreach_matches_loop(rule, kwargs):
+    T.manual_seed(0)
+    params, grads = tensors(), tensors()
+    expected = [p.clone() for p in params]
+    for p, grad in zip(expected, grads):
+        # N_Clip and N_ABS only update parameters with a gradient
+        p.grad = grad
+        rule(p, grad, **kwargs)
+    rule.foreach(params, grads, **kwargs)
+    for p, e in zip(params, expected):
+        assert T.equal(p, e)
+
+
+@pytest.mark.parametrize('optimizer_class, u_func, kwargs', [
+    (MSGD, M_ABS(), dict(momentum=0.9)),
+    (MSGD, M_SPOW(), dict(momentum=0.9, nesterov=True)),
+    (MSGD, M_ABS(), dict(momentum=0.9, momentum_type='tanh')),
+    (HMSGD, H_ABS(), dict(lr=0.05, g=0.3, momentum=0.9)),
+])
+def test_foreach_step_matches_loop(optimizer_class, u_func, kwargs):
+    params = []
+    for foreach in (False, True):
+        T.manual_seed(0)
+        group = [T.nn.Parameter(p) for p in tensors()]
+        optimizer = optimizer_class(group,
+                                    u_func=u_func,
+                                    lr_in=0.5,
+                                    lr_out=0.1,
+                                    foreach=foreach,
+                                    **kwargs)
+        for _ in range(3):
+            for p in group:
+                p.grad = T.randn_like(p)
+            optimizer.step()
+        params.append(group)
+    for p, e in zip(*params):
+        assert T.equal(p, e)
+
+
+@pytest.mark.parametrize('foreach', [False, True])
+def test_msgd_first_nesterov_step_uses_gradient(foreach):
+    T.manual_seed(0)
+    p = T.nn.Parameter(T.rand(5))
+    expected = p.detach().clone()
+    grad = T.randn(5)
+    M_ABS()(expected, grad, lr_in=0.5, lr_out=0.1)
+    optimizer = MSGD([p],
+                     u_func=M_ABS(),
+                     lr_in=0.5,
+                     lr_out=0.1,
+                     momentum=0.9,
+                     nesterov=True,
+                     foreach=foreach)
+    p.grad = grad
+    optimizer.step()
+    assert T.equal(p.detach(), expected)